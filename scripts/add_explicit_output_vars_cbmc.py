@@ -18,9 +18,10 @@
 #==============================================================================
 
 import sys
+import dimacs
 
 script_name = "add_explicit_output_vars_cbmc.py"
-version = "0.0.3"
+version = "0.0.4"
 
 if len(sys.argv) == 2 and sys.argv[1] == '-v':
     print('Script ' + script_name + ' of version : ' + version)
@@ -41,40 +42,31 @@ print('output program name : ' + output_program_name)
 varnum = -1
 clanum = -1
 output_vars_litarals = dict()
-clauses = []
 # Example of output variable y: c main::1::y!0@1#2 -1 10 12 14 16 18 20 22
 
 print('Trying to find output array ' + output_program_name)
 prefix_array = output_program_name + '!0@1#2[['
 prefix_variable = output_program_name + '!0@1#1'
 
-with open(cnfname, 'r') as f:
-    lines = f.read().splitlines()
-    for line in lines:
-        if 'p cnf ' in line:
-            words = line.split()
-            assert(len(words) == 4)
-            varnum = int(words[2])
-            clanum = int(words[3])
-        elif prefix_array in line:
-            print('Output program array detected :')
-            print(line)
-            id = int(line.split(prefix_array)[1].split(']')[0])
-            words = line.split(' ')[2:]
-            output_vars_litarals[id] = [int(w) for w in words]
-        elif prefix_variable in line:
-            print('Output program variable detected :')
-            print(line)
-            words = line.split('0@1#1')[1].split()
-            output_vars_litarals[0] = [int(w) for w in words]
-        elif 'c ' in line:
-            continue
-        else:
-            clauses.append(line)
+cnf = dimacs.read_cnf(cnfname)
+varnum = cnf.vars_num
+clanum = cnf.clauses_num
+for line in dimacs.iter_comments(cnf):
+    if prefix_array in line:
+        print('Output program array detected :')
+        print(line)
+        id = int(line.split(prefix_array)[1].split(']')[0])
+        words = line.split(' ')[2:]
+        output_vars_litarals[id] = [int(w) for w in words]
+    elif prefix_variable in line:
+        print('Output program variable detected :')
+        print(line)
+        words = line.split('0@1#1')[1].split()
+        output_vars_litarals[0] = [int(w) for w in words]
 
 assert(varnum > 0 and clanum > 0)
 print(str(varnum) + ' vars and ' + str(clanum) + ' clauses.')
-assert(len(clauses) == clanum)
+assert(cnf.clause_lines == clanum)
 
 literals = []
 for id in output_vars_litarals:
@@ -99,23 +91,18 @@ for i in range(len(literals)):
     # Two variables are equal: 
     assert(literals[i] != 0)
     if literals[i] > 0:
-      new_clauses.append(str(new_vars[i]) + ' -' + str(literals[i]) + ' 0')
-      new_clauses.append('-' + str(new_vars[i]) + ' ' + str(literals[i]) + ' 0')
+      new_clauses.append([new_vars[i], -literals[i]])
+      new_clauses.append([-new_vars[i], literals[i]])
     # Two variables are inequal:
     else:
-      new_clauses.append(str(new_vars[i]) + ' ' + str(abs(literals[i])) + ' 0')
-      new_clauses.append('-' + str(new_vars[i]) + ' -' + str(abs(literals[i])) + ' 0')
+      new_clauses.append([new_vars[i], abs(literals[i])])
+      new_clauses.append([-new_vars[i], -abs(literals[i])])
 
 print('The first 10 new clauses:')
 for i in range(10):
-    print(new_clauses[i])
+    print(dimacs.clause_line(new_clauses[i]).decode().rstrip())
 
 new_cnfname = cnfname.split('.cnf')[0] + '_explicit_output.cnf'
 new_varnum = varnum + new_vars_num
-new_clanum = len(clauses) + len(new_clauses)
-with open(new_cnfname, 'w') as f:
-    f.write('p cnf ' + str(new_varnum) + ' ' + str(new_clanum) + '\n')
-    for c in clauses:
-        f.write(c + '\n')
-    for c in new_clauses:
-        f.write(c + '\n')
+with open(new_cnfname, 'wb') as f:
+    dimacs.write_cnf(f, cnf, new_clauses, new_varnum)
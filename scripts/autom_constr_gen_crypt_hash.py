@@ -4,17 +4,41 @@
 #
 # Cube-and-Conquer-based generation of constraints for cryptographic hash
 # functions.
+#
+# The CNF is held in memory (see formula.py). After each chosen cube, unit
+# propagation simplifies it, and only the simplified CNF with renumbered
+# variables is written for the lookahead and CDCL solvers, along with its
+# back-map <cnf>.map. Cubes in logs are given in the original variables. If
+# unit propagation refutes the total cube, the CDCL solver is not called.
+# Free variables are counted by unit_prop.py, and literals of a chosen cube
+# which are implied by its other literals are dropped.
+#
+# Add -parallel=<int> to run several species of restarts at once, one per CPU
+# core, as run_autom_constr_gen.sh does: the first cube type, the last one,
+# and random ones with seeds seed, seed+1, ... (-cubetype is ignored then).
+# Outcomes of restarts of all species are written to a single results log
+# log_<cnf>_parallel, and the first found satisfying assignment stops all
+# species.
 #==============================================================================
 
 import sys
 import time
 import random
 import os
+import signal
+import queue
 import logging
+import multiprocessing as mp
 from enum import Enum
 import os.path
+import cube_file
+import formula
+import unit_prop
+import lookahead_cache
+import solver_scheduler
+import solver_adapters
 
-version = '0.3.1'
+version = '0.5.2'
 script_name = 'autom_constr_gen_crypt_hash.py'
 
 LOOKAHEAD_SOLVER = 'march_cu'
@@ -22,6 +46,8 @@ LOOHAHEAD_TIMELIM = 60
 CDCL_SOLVER = 'kissat4.0.1'
 MAX_TOTAL_CUBE_SIZE = 50
 MAX_ITER = 2
+# Seconds between checks whether parallel species are alive:
+POLL_PERIOD = 1
 
 class CubeType(Enum):
     first = 1
@@ -36,12 +62,18 @@ class Options:
   min_cubes = 1000          # Minimal cubes for each iteration
   seed = 0                  # random seed
   verb = 0                  # verbosity
+  la_cache = ''             # directory for caching lookahead runs
+  la_cache_size = 10        # maximal size of the cache in GB
+  parallel = 1              # number of species run in parallel
   def __str__(self):
     return 'cube type : ' + str(self.cubetype.name) + '\n' +\
     'nstep : ' + str(self.nstep) + '\n' +\
     'cdcl_maxtime : ' + str(self.cdcl_maxtime) + '\n' +\
     'min_cubes : ' + str(self.min_cubes) + '\n' +\
-    'seed : ' + str(self.seed) + '\n'
+    'seed : ' + str(self.seed) + '\n' +\
+    'la_cache : ' + str(self.la_cache) + '\n' +\
+    'la_cache_size : ' + str(self.la_cache_size) + '\n' +\
+    'parallel : ' + str(self.parallel) + '\n'
   def read(self, argv) :
     for p in argv:
       if '-cubetype=' in p:
@@ -65,6 +97,12 @@ class Options:
         self.seed = int(p.split('-seed=')[1])
       if '-verb=' in p:
         self.verb = int(p.split('-verb=')[1])
+      if '-lacache=' in p:
+        self.la_cache = p.split('-lacache=')[1]
+      if '-lacachegb=' in p:
+        self.la_cache_size = int(p.split('-lacachegb=')[1])
+      if '-parallel=' in p:
+        self.parallel = int(p.split('-parallel=')[1])
 
 def print_usage():
 	print('Usage : ' + script_name + ' CNF [options]')
@@ -74,62 +112,41 @@ def print_usage():
 	'-cdclmaxtime=<int>    - (default : 5000)         CDCL solver time limit in seconds on CNFs' + '\n' +\
 	'-mincubes=<int>       - (default : 1000)         Minimal cubes for each iteration' + '\n' +\
 	'-seed=<int>           - (default : time)         seed for pseudorandom generator' + '\n' +\
-	'-verb=<int>           - (default : 1)            verbose level; quiet if 0')
+	'-verb=<int>           - (default : 1)            verbose level; quiet if 0' + '\n' +\
+	'-lacache=<str>        - (default : '')           directory for caching lookahead runs' + '\n' +\
+	'-lacachegb=<int>      - (default : 10)           maximal size in GB of the lookahead cache' + '\n' +\
+	'-parallel=<int>       - (default : 1)            number of species (cube types and seeds) run in parallel')
 
-# Read cubes from file:
+# Read cubes from a text or binary cube file:
 def read_cubes(cubes_name : str):
   if not os.path.isfile(cubes_name):
     return []
-  cubes = []
-  with open(cubes_name) as cubes_file:
-    lines = cubes_file.read().splitlines()
-    for line in lines:
-      cube = []
-      for x in line.split(' '):
-        if x == 'a' or x == '0':
-          continue
-        cube.append(x)
-      if len(cube) > 0:
-        cubes.append(cube)
-  return cubes
+  return cube_file.read_cubes(cubes_name)
 
-# Read free vars counted by march (they are different from the number of all variables):
-def get_march_free_vars_num(cnf_name : str):
-  sys_str = LOOKAHEAD_SOLVER + ' ' + cnf_name + ' -d 1'
-  o = os.popen(sys_str).read()
-  lines = o.split('\n')
-  vars = -1
-  for line in lines:
-    if 'c number of free variables = ' in line:
-      vars = int(line.split('c number of free variables = ')[1])
-  assert(vars > 0)
-  return vars
+# Cache of lookahead runs, None if not used:
+la_cache = None
 
-# Add cube to a CNF as one-literal clauses:
-def add_cube(old_cnf_name : str, new_cnf_name : str, cube : list):
-	cnf_var_number = 0
-	clauses = []
-	with open(old_cnf_name, 'r') as cnf_file:
-		lines = cnf_file.readlines()
-		for line in lines:
-			if len(line) < 2 or line[0] == 'c':
-				continue
-			if line[0] == 'p':
-				cnf_var_number = line.split(' ')[2]
-			else:
-				clauses.append(line)
-	clauses_number = len(clauses) + len(cube)
-	#print('clauses_number : %d' % clauses_number)
-	with open(new_cnf_name, 'w') as cnf_file:
-		cnf_file.write('p cnf ' + str(cnf_var_number) + ' ' + str(clauses_number) + '\n')
-		for cl in clauses:
-			cnf_file.write(cl)
-		for c in cube:
-			cnf_file.write(c + ' 0\n')
+# Run lookahead solver on a CNF with cutoff threshold n, write cubes to a file.
+# If timelim > 0, the run is limited by timelim seconds. A finished run is
+# taken from (or put to) the cache of lookahead runs, a cached run which
+# took longer than timelim is not taken:
+def run_lookahead(cnf_name : str, n : int, cubes_name : str, timelim=0):
+    if la_cache is not None and \
+       la_cache.get(cnf_name, n, LOOKAHEAD_SOLVER, cubes_name, time_limit=timelim) is not None:
+        return
+    remove_file(cubes_name)
+    march_sys_str = LOOKAHEAD_SOLVER + ' ' + cnf_name + ' -n ' + str(n) +\
+    ' -o ' + cubes_name
+    t = time.time()
+    o = solver_scheduler.run_cmd_sync(march_sys_str, wall_limit=timelim)
+    t = float(time.time() - t)
+    cubes_num, refuted_leaves = lookahead_cache.parse_cubing_log(o)
+    if la_cache is not None and cubes_num >= 0:
+        la_cache.put(cnf_name, n, LOOKAHEAD_SOLVER, cubes_name, cubes_num, refuted_leaves, t)
 
-# Choose a maximal cutoff threshold that gives a desired number of cubes:
-def choose_cutoff_lookahead(op : Options, cnf_name : str):
-    free_vars_num = get_march_free_vars_num(cnf_name)
+# Choose a maximal cutoff threshold that gives a desired number of cubes.
+# The cubes of the chosen threshold are returned to choose a cube from them:
+def choose_cutoff_lookahead(op : Options, cnf_name : str, free_vars_num : int):
     # Form a temporary CNF name - different for each cube type and seed:
     cubetype_full_name = op.cubetype.name
     if (op.cubetype.name == 'random'):
@@ -138,9 +155,9 @@ def choose_cutoff_lookahead(op : Options, cnf_name : str):
     n = free_vars_num - op.nstep
     k = 1
     n_final = 0
-    cubes_num_final = 0
+    cubes_final = []
     n_prev = 0
-    cubes_num_prev = 0
+    cubes_prev = []
     is_first = True
     while True:
       # Delete file with cubes
@@ -148,15 +165,10 @@ def choose_cutoff_lookahead(op : Options, cnf_name : str):
       assert(n > 0 and n < free_vars_num)
       # Do not limit the first call to get at least one cutoff:
       if is_first:
-        march_sys_str = LOOKAHEAD_SOLVER + ' ' + cnf_name + ' -n ' + str(n) +\
-        ' -o ' + tmp_cubes_file_name 
+        run_lookahead(cnf_name, n, tmp_cubes_file_name)
         is_first = False
       else:
-        march_sys_str = 'timeout ' + str(LOOHAHEAD_TIMELIM) + ' ' +\
-        LOOKAHEAD_SOLVER + ' ' + cnf_name + ' -n ' + str(n) +\
-        ' -o ' + tmp_cubes_file_name 
-      # Run cubing:
-      os.popen(march_sys_str).read()
+        run_lookahead(cnf_name, n, tmp_cubes_file_name, LOOHAHEAD_TIMELIM)
       # Get cubes:
       cubes = read_cubes(tmp_cubes_file_name)
       cubes_num = len(cubes)
@@ -167,36 +179,38 @@ def choose_cutoff_lookahead(op : Options, cnf_name : str):
       logging.info(s)
       if cubes_num > op.min_cubes:
           n_final = n
-          cubes_num_final = cubes_num
+          cubes_final = cubes
           break
       elif cubes_num == 0:
           n_final = n_prev
-          cubes_num_final = cubes_num_prev
+          cubes_final = cubes_prev
           break
       else:
           n_prev = n
-          cubes_num_prev = cubes_num
+          cubes_prev = cubes
           if cubes_num <= 2:
             k += 1
             n = n - op.nstep*k
           else:
             n = n - op.nstep
+    remove_file(tmp_cubes_file_name)
     assert(n_final > 0)
     s = ' final cutoff, n=' + str(n_final)
     print(s)
     logging.info(s)
-    return n_final, cubes_num_final
+    return n_final, cubes_final
 
-# Generate cubes by lookahead, choose one cube and add it to a given CNF.
-# cnf_name - CNF on which march is run;
+# Choose one cube out of cubes generated by lookahead and add it to a given CNF.
+# cubes - cubes made by lookahead on cnf_name with threshold n;
+# form - formula written to cnf_name, the cube is assigned to it;
+# prop - unit propagator of the formula;
 # orig_cnf_name - is needed only for forming a new CNF name;
-# iter_cnf_name - CNF to which a chosen cube is added.
-def find_cube_add_to_cnf(n : int, op : Options, cnf_name : str, \
-                         orig_cnf_name : str, itr : int, restart_num : int, \
-                         verb : int):
+# iter_cnf_name - simplified CNF which is written if the cube is not refuted.
+def find_cube_add_to_cnf(n : int, cubes : list, free_vars_num : int, form : formula.Formula, \
+                         prop : unit_prop.Propagator, op : Options, cnf_name : str, orig_cnf_name : str, itr : int, \
+                         restart_num : int, verb : int):
     if verb:
         print('cnf name : ' + cnf_name)
-    free_vars_num = get_march_free_vars_num(cnf_name)
     assert(free_vars_num > 0)
     if verb:
         print('free_vars_num : ' + str(free_vars_num))
@@ -206,18 +220,6 @@ def find_cube_add_to_cnf(n : int, op : Options, cnf_name : str, \
       cubetype_full_name += '-seed=' + str(op.seed)
     iter_cnf_name = orig_cnf_name.split('.cnf')[0] + '_' + cubetype_full_name +\
     '_restart' + str(restart_num) + '_iter' + str(itr) + '.cnf'
-    # Form file name for cubes:
-    tmp_cubes_file_name ='tmp_cubes_' + cubetype_full_name
-    # Form string for running march:
-    march_sys_str = LOOKAHEAD_SOLVER + ' ' + cnf_name + ' -n ' +\
-    str(n) + ' -o ' + tmp_cubes_file_name 
-    if verb:
-        print(march_sys_str)
-    # Run cubing:
-    os.popen(march_sys_str).read()
-    # Get cubes:
-    cubes = read_cubes(tmp_cubes_file_name)
-    remove_file(tmp_cubes_file_name)
     # Choose a proper cube:
     cubes_num = len(cubes)
     if verb:
@@ -235,96 +237,107 @@ def find_cube_add_to_cnf(n : int, op : Options, cnf_name : str, \
         cube = cubes[j]
     elif op.cubetype.name == 'last':
         cube = cubes[-1]
+    # Cubes are made on the simplified CNF, implied literals are dropped:
+    cube = form.to_orig(cube)
+    if not prop.refutes(cube):
+        reduced = prop.reduce_cube(cube)
+        # A cube whose literals are all implied adds nothing, it is kept:
+        if len(reduced) > 0:
+            cube = reduced
     if verb:
         print('chosen cube : ')
         print(cube)
-    # Add cube to a new CNF:
-    add_cube(cnf_name, iter_cnf_name, cube)
+    # Propagate the cube and write the simplified CNF:
+    is_refuted = not form.assign(cube)
+    if not is_refuted:
+        form.write(iter_cnf_name)
+    if verb:
+        print('formula : ' + str(form))
     #
-    return cubes_num, iter_cnf_name, cube, n
+    return cubes_num, iter_cnf_name, cube, n, is_refuted
 
 # Remove file:
 def remove_file(file_name):
 	sys_str = 'rm -f ' + file_name
 	os.popen(sys_str).read()
 
-def parse_cdcl_result(o):
-	res = 'UNKNOWN'
-	lines = o.split('\n')
-	for line in lines:
-		if len(line) < 12:
-			continue
-		if 's SATISFIABLE' in line:
-			res = 'SAT'
-			break
-		elif 's UNSATISFIABLE' in line:
-			res = 'UNSAT'
-			break
-	return res
-
 def cdcl_call(cnf_name : str, maxmeasure : int, type : str):
     assert(type == 'time' or type == 'confl')
+    adapter = solver_adapters.get_adapter(CDCL_SOLVER)
     if type == 'confl':
-      sys_str = CDCL_SOLVER + ' ' + cnf_name + ' ' + '--conflicts=' + str(maxmeasure)
+      params = adapter.conflict_limit(maxmeasure)
     else:
-      sys_str = CDCL_SOLVER + ' ' + cnf_name + ' ' + '--time=' + str(maxmeasure)
-    t = time.time()
-    log = os.popen(sys_str).read()
-    t = float(time.time() - t)
-    res = parse_cdcl_result(log)
-    return res, t
-
-# Main function:
-if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print_usage()
-        exit(1)
-    orig_cnf_name = sys.argv[1]
-
-    op = Options()
-    op.read(sys.argv[2:])
-    print(op)
-
-    random.seed(op.seed)
+      params = adapter.time_limit(maxmeasure)
+    # The log is parsed on the fly, it is not kept:
+    solver_log = adapter.solver_log()
+    run_stat = solver_scheduler.run_cmd_sync_stat(adapter.command(cnf_name, params), parser=solver_log)
+    return solver_log.answer, run_stat.wall_time, run_stat.cpu_time(), run_stat.max_rss
 
-    cubetype_full_name = op.cubetype.name
+# Name of a species of restarts, it is unique for a cube type and a seed:
+def species_name(op : Options):
+    name = op.cubetype.name
     if (op.cubetype.name == 'random'):
-      cubetype_full_name += '-seed=' + str(op.seed)
+      name += '-seed=' + str(op.seed)
+    return name
 
+# Prepare a species' run: the pseudorandom generator, the lookahead cache,
+# and the log:
+def init_species(op : Options, orig_cnf_name : str):
+    global la_cache
+    random.seed(op.seed)
+    if op.la_cache != '':
+        la_cache = lookahead_cache.LookaheadCache(op.la_cache, op.la_cache_size * 2**30)
     log_name = './log_' + orig_cnf_name.replace('./','').replace('.cnf','') + \
-    '_' + cubetype_full_name
+    '_' + species_name(op)
     print('log_name : ' + log_name)
-    logging.basicConfig(filename=log_name, filemode = 'w', level=logging.INFO)
-
+    logging.basicConfig(filename=log_name, filemode = 'w', level=logging.INFO, force=True)
     logging.info('CNF : ' + orig_cnf_name)
     logging.info(str(op))
 
+# Do restarts until a satisfying assignment is found or cubes are not made.
+# Outcomes of restarts are put to results_queue if it is given:
+def search(op : Options, orig_cnf_name : str, results_queue=None):
     start_time = time.time()
-    s = 'Original CNF, ' + str(get_march_free_vars_num(orig_cnf_name)) + ' vars'
+    # The original CNF is read and propagated once:
+    orig_form = formula.Formula.read(orig_cnf_name)
+    orig_prop = unit_prop.Propagator(orig_form.clauses, orig_form.vars_num)
+    orig_free_vars_num = orig_prop.free_vars_num()
+    form = orig_form.copy()
+    s = 'Original CNF, ' + str(orig_free_vars_num) + ' vars'
     print(s)
     itr = 0
     restart_num = 0
     cur_cnf_name = orig_cnf_name
     total_cube = []
+    is_sat = False
 
     cubes_num = 0
     while True:
         if op.verb:
             print('\n')
         s = 'restart ' + str(restart_num) + ', iteration ' + str(itr) + ', '
-        s += str(get_march_free_vars_num(cur_cnf_name)) + ' vars'
-        n, cubes_num = choose_cutoff_lookahead(op, cur_cnf_name)
-        assert(cubes_num >= 0)
+        if cur_cnf_name == orig_cnf_name:
+            prop = orig_prop
+            free_vars_num = orig_free_vars_num
+        else:
+            prop = unit_prop.Propagator(form.clauses, form.vars_num)
+            free_vars_num = prop.free_vars_num()
+        s += str(free_vars_num) + ' vars'
+        n, cubes = choose_cutoff_lookahead(op, cur_cnf_name, free_vars_num)
+        cubes_num = len(cubes)
         if cubes_num == 0 or cubes_num == 1:
             print('<= 0 or 1 cubes. break.')
             logging.info('<= 0 or 1 cubes. break.')
             break
-        res = find_cube_add_to_cnf(n, op, cur_cnf_name, orig_cnf_name, itr, restart_num, op.verb)
+        res = find_cube_add_to_cnf(n, cubes, free_vars_num, form, prop, op, cur_cnf_name, orig_cnf_name, \
+                                   itr, restart_num, op.verb)
         assert(res[0] > 0 and len(res[2]) > 0)
         cubes_num = res[0]
+        is_refuted = res[4]
         #
         if cur_cnf_name != orig_cnf_name and res[0] != 'SAT':
             remove_file(cur_cnf_name)
+            remove_file(cur_cnf_name + '.map')
         cur_cnf_name = res[1]
         #
         cube = res[2]
@@ -335,30 +348,49 @@ if __name__ == '__main__':
           s += ' ' + str(x)
         total_cube.extend(cube)
         s += '\ntotal cube size : ' + str(len(total_cube))
+        s += '\nsimplified CNF : ' + str(form)
         print(s)
         logging.info(s)
-        res = cdcl_call(cur_cnf_name, op.cdcl_maxtime, 'time')
+        # A refuted cube has no CNF, the CDCL solver is not needed:
+        if is_refuted:
+            res = ('UNSAT', 0.0, 0.0, 0)
+        else:
+            res = cdcl_call(cur_cnf_name, op.cdcl_maxtime, 'time')
         # Remove current cubed CNF if not SAT:
         assert(cur_cnf_name != orig_cnf_name)
         # Break if SAT is found:
         if res[0] == 'SAT':
-            is_SAT = True
+            is_sat = True
             s0 = '\n*** SAT ' + cur_cnf_name + ' ' + res[0] + ' ' + str(res[1]) + ' seconds'
+            s0 += ' (CPU ' + str(res[2]) + ' seconds, max RSS ' + str(res[3]) + ' KB)'
             print(s0)
             logging.info(s0)
+            if results_queue is not None:
+                results_queue.put((species_name(op), True, s0.strip() + ', total cube :' + \
+                                   ''.join([' ' + str(x) for x in total_cube])))
             break
         elif res[0] == 'UNSAT' or (len(total_cube) >= MAX_TOTAL_CUBE_SIZE and itr >= MAX_ITER):
             s0 = ''
-            if res[0] == 'UNSAT':
+            if is_refuted:
+              s0 = '\n** UNSAT ' + cur_cnf_name + ' refuted by unit propagation'
+            elif res[0] == 'UNSAT':
               s0 = '\n** UNSAT ' + cur_cnf_name + ' ' + res[0] + ' ' + str(res[1]) + ' seconds'
+              s0 += ' (CPU ' + str(res[2]) + ' seconds, max RSS ' + str(res[3]) + ' KB)'
             else:
               s0 = '\n** Reached limit on total cube size and iterations'
             s0 += '\n** Restart after ' + str(int(time.time() - start_time)) + ' seconds'
             print(s0)
             logging.info(s0)
+            if results_queue is not None:
+                results_queue.put((species_name(op), False, 'restart ' + str(restart_num) + ', total cube size ' + \
+                                   str(len(total_cube)) + ', ' + s0.strip().replace('\n', ', ')))
             itr = 0
             restart_num += 1
+            if not is_refuted:
+                remove_file(cur_cnf_name)
+                remove_file(cur_cnf_name + '.map')
             cur_cnf_name = orig_cnf_name
+            form = orig_form.copy()
             total_cube = []
         else:
             itr += 1
@@ -375,3 +407,84 @@ if __name__ == '__main__':
     s = '\nTotal time : ' + str(total_time)
     print(s)
     logging.info(s)
+    return is_sat
+
+# A species run by a process of the parallel mode:
+def run_species(op : Options, orig_cnf_name : str, results_queue):
+    # Solvers' runs are stopped with the species, see run_cmd_sync_stat():
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    init_species(op, orig_cnf_name)
+    search(op, orig_cnf_name, results_queue)
+
+# Options of species of the parallel mode, like in run_autom_constr_gen.sh:
+def species_options(op : Options):
+    ops = []
+    for i in range(op.parallel):
+        sp = Options()
+        sp.__dict__.update(op.__dict__)
+        sp.parallel = 1
+        if i == 0:
+            sp.cubetype = CubeType.first
+        elif i == 1:
+            sp.cubetype = CubeType.last
+        else:
+            sp.cubetype = CubeType.random
+            sp.seed = op.seed + i - 2
+        ops.append(sp)
+    return ops
+
+# Run species in parallel until the first satisfying assignment is found:
+def parallel_search(op : Options, orig_cnf_name : str):
+    log_name = './log_' + orig_cnf_name.replace('./','').replace('.cnf','') + '_parallel'
+    print('log_name : ' + log_name)
+    logging.basicConfig(filename=log_name, filemode = 'w', level=logging.INFO)
+    logging.info('CNF : ' + orig_cnf_name)
+    logging.info(str(op))
+    start_time = time.time()
+    results_queue = mp.Queue()
+    procs = []
+    for sp in species_options(op):
+        p = mp.Process(target=run_species, args=(sp, orig_cnf_name, results_queue))
+        p.start()
+        procs.append(p)
+        logging.info('species ' + species_name(sp) + ' is started, pid ' + str(p.pid))
+    is_sat = False
+    try:
+        while not is_sat:
+            try:
+                name, is_sat, s = results_queue.get(timeout=POLL_PERIOD)
+            except queue.Empty:
+                if not any([p.is_alive() for p in procs]) and results_queue.empty():
+                    break
+                continue
+            s = name + ' : ' + s + ' (' + str(int(time.time() - start_time)) + ' seconds)'
+            print(s)
+            logging.info(s)
+    finally:
+        # Stop the rest of species:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        for p in procs:
+            p.join()
+    s = 'SAT is found' if is_sat else 'all species are finished'
+    s += ', total time : ' + str(float(time.time() - start_time))
+    print(s)
+    logging.info(s)
+
+# Main function:
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print_usage()
+        exit(1)
+    orig_cnf_name = sys.argv[1]
+
+    op = Options()
+    op.read(sys.argv[2:])
+    print(op)
+
+    if op.parallel > 1:
+        parallel_search(op, orig_cnf_name)
+    else:
+        init_species(op, orig_cnf_name)
+        search(op, orig_cnf_name)
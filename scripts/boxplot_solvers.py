@@ -4,6 +4,9 @@
 #
 # Calculate runtime estimations given a SAT solver's runtimes on a sample
 # and the total amount of cubes.
+# By default, estimations are based on wall time. Add -metric=cpu (user plus
+# system time), -metric=user, or -metric=sys to use CPU time measured by
+# find_cnc_threshold.py, it is not inflated if CPU cores are oversubscribed.
 #==============================================================================
 
 import matplotlib.pyplot as plt
@@ -14,7 +17,7 @@ import sys
 import glob
 import os
 
-version = "0.1.12"
+version = "0.1.13"
 script_name = 'boxplot_solvers.py'
 
 PC_CORES = 12
@@ -23,6 +26,9 @@ y_limit = 5100
 EST_STR_WIDTH = 25
 SAMPLE_SIZE = 1000
 PARSE_TIME = 0.01
+# Runtime metric to estimate, see read_unsat_samples():
+METRICS = ['time', 'cpu', 'user', 'sys']
+metric = 'time'
 
 solvers_short_names_dict = {'./cnc-cadical.sh' : 'cnc_cad', './cnc-glucose.sh' : 'cnc_gluc',  './rokk' : 'rokk', \
 './minisat2.2' : 'minisat', './slime' : 'slime', './cdclcrypto' : 'cdclcrypto', './kissat_sc2021' : 'kissat-2021', \
@@ -145,8 +151,13 @@ def read_unsat_samples(unsat_samples_file_name : str):
 	for index, row in df_unsat_samples.iterrows():
 		n = int(row['n'])
 		t = float(row['time'])
+		# The time limit is on wall time:
 		if t >= SOLVER_TIME_LIM:
 			t = -1
+		elif metric == 'cpu':
+			t = float(row['user-time']) + float(row['sys-time'])
+		elif metric != 'time':
+			t = float(row[metric + '-time'])
 		if row['solver'] in solvers_short_names_dict:
 		    s = solvers_short_names_dict[row['solver']]
 		else:
@@ -223,7 +234,7 @@ def process_unsat_samples(unsat_samples_file_name : str, cubes_dict : dict ):
 
 if __name__ == '__main__':
 	if len(sys.argv) < 3:
-			sys.exit('Usage: ' + script_name + ' stat_file sample_runtimes|-s=sat_logs_mask')
+			sys.exit('Usage: ' + script_name + ' stat_file sample_runtimes|-s=sat_logs_mask [-metric=time|cpu|user|sys]')
 
 	cubes_stat_file_name = sys.argv[1]
 	print('cubes_stat_file_name : ' + cubes_stat_file_name)
@@ -238,6 +249,11 @@ if __name__ == '__main__':
 		assert('-u=' not in word)
 		unsat_samples_file_name = word.replace('./', '')
 		print('unsat_samples_file_name : ' + unsat_samples_file_name)
+	for word in sys.argv[3:]:
+		if '-metric=' in word:
+			metric = word.split('-metric=')[1]
+			assert(metric in METRICS)
+	print('metric : ' + metric)
 
 	cubes_dict = dict()
 	df = pd.read_csv(cubes_stat_file_name, delimiter = ' ')
@@ -7,9 +7,10 @@
 #==============================================================================
 
 import sys
+import dimacs
 
 script_name = 'cnf_stats.py'
-version = '0.0.1'
+version = '0.0.2'
 
 if len(sys.argv) != 2:
   sys.exit('Usage : ' + script_name + ' CNF')
@@ -23,19 +24,11 @@ vars = set()
 clauses_num = 0
 literals_num = 0
 
-with open(cnfname, 'r') as cnf:
-  lines = cnf.read().splitlines()
-  for s in lines:
-    #print(line)
-    if s[0] == 'c' or s[0] == 'p':
-      continue
-    clauses_num += 1
-    literals = s.split(' ')[:-1] # exclude 0 at the end
-    literals_num += len(literals)
-    for lit in literals:
-      var = abs(int(lit))
-      if var not in vars:
-        vars.add(var)
+cnf = dimacs.read_cnf(cnfname)
+for clause in dimacs.iter_clauses(cnf):
+  clauses_num += 1
+  literals_num += len(clause)
+  vars.update([abs(lit) for lit in clause])
 
 print(str(len(vars)) + ' variables')
 print(str(clauses_num) + ' clauses')
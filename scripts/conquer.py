@@ -0,0 +1,329 @@
+# Created on: 17 Oct 2026
+# Author: Oleg Zaikin
+# E-mail: zaikin.icc@gmail.com
+#
+# Conquer phase of Cube-and-Conquer: cubes are added to a CNF, and the
+# resulting subproblems are solved by a CDCL solver on several CPU cores.
+# This is a counterpart of conquer_mt where solvers' runs are managed by
+# solver_scheduler.py, and solvers are called and their logs are parsed by
+# solver_adapters.py as in find_cnc_threshold.py.
+#
+# Cubes are solved in descending order of their size, as compare_by_cube_size
+# of conquer_mpi sorts them, while the order of cubes of equal size is kept.
+# Each result is appended at once to !cubes_info_<postfix> in the format of
+# conquer_mt: 'id status result time', where status 1 means processed, and
+# result is 0 (UNSAT), 1 (SAT), or 2 (interrupted). Add --resume to skip
+# cubes whose results are there. Once a satisfying assignment is found, all
+# runs are stopped unless --enum is given. At the end, statistics are written
+# to !progress_<postfix>, and unsolved cubes to !interrupted_<postfix> .
+# A model is written to !sat_out_cube_id_<id>_<postfix> .
+#
+# Example:
+#     python3 ./conquer.py kissat problem.cnf ./cubes 5000 -cpunum=12
+#   adds cubes from the file ./cubes to the CNF problem.cnf and solves them by
+#   the solver kissat on 12 CPU cores, each cube is limited by 5000 seconds.
+#==============================================================================
+
+import sys
+import os
+import time
+import signal
+import asyncio
+import multiprocessing as mp
+import dimacs
+import cube_file
+import solver_scheduler
+import solver_adapters
+from online_stat import OnlineStat
+
+version = '0.0.2'
+script_name = 'conquer.py'
+
+# Status and results of cubes as in conquer_mt:
+PROCESSED = 1
+UNSAT = 0
+SAT = 1
+INTERR = 2
+RESULT_NAMES = {UNSAT : 'UNSAT', SAT : 'SAT', INTERR : 'INTERR'}
+
+# Seconds between printing statistics:
+REPORT_PERIOD = 60
+
+# Input options:
+class Options:
+    cpu_num = mp.cpu_count()
+    param_file = ''
+    enum = False
+    stdin = False
+    resume = False
+    sort = True
+    verb = False
+    def __str__(self):
+        s = 'cpu_num : ' + str(self.cpu_num) + '\n' +\
+        'param_file : ' + str(self.param_file) + '\n' +\
+        'enum : ' + str(self.enum) + '\n' +\
+        'stdin : ' + str(self.stdin) + '\n' +\
+        'resume : ' + str(self.resume) + '\n' +\
+        'sort : ' + str(self.sort) + '\n' +\
+        'verb : ' + str(self.verb) + '\n'
+        return s
+    def read(self, argv) :
+        for p in argv:
+            if '-cpunum=' in p:
+                self.cpu_num = int(p.split('-cpunum=')[1])
+            if '-param=' in p:
+                self.param_file = p.split('-param=')[1]
+            if p == '--enum':
+                self.enum = True
+            if p == '--stdin':
+                self.stdin = True
+            if p == '--resume':
+                self.resume = True
+            if p == '--nosort':
+                self.sort = False
+            if p == '--verb':
+                self.verb = True
+
+def print_usage():
+    print('Usage : ' + script_name + ' solver CNF cubes cube-time-limit [options]')
+    print('options :\n' +\
+    '-cpunum=<int>   - (default : ' + str(mp.cpu_count()) + ')  number of used CPU cores' + '\n' +\
+    '-param=<str>    - (default : \'\')  file with parameters for the solver' + '\n' +\
+    '--enum          - (default : False)  solve all cubes even if SAT is found' + '\n' +\
+    '--stdin         - (default : False)  give CNFs with cubes to the solver via stdin' + '\n' +\
+    '--resume        - (default : False)  skip cubes solved by an interrupted run' + '\n' +\
+    '--nosort        - (default : False)  solve cubes in the order of the cube file' + '\n' +\
+    '--verb          - (default : False)  print each result')
+
+# Remove dots and slashes from a name as conquer_mt does:
+def clear_name(name : str):
+    return name.replace('.', '').replace('/', '')
+
+def remove_file(file_name : str):
+    if os.path.isfile(file_name):
+        os.remove(file_name)
+
+# Result of a solver by its parsed log:
+def log_result(solver_log : solver_adapters.SolverLog):
+    if solver_log.answer == solver_adapters.SAT:
+        return SAT
+    if solver_log.answer == solver_adapters.UNSAT:
+        return UNSAT
+    return INTERR
+
+# Results of processed cubes from a cubes info file, id -> (result, time):
+def read_cubes_info(info_name : str):
+    done = dict()
+    with open(info_name, 'r') as f:
+        for line in f:
+            words = line.split()
+            # A line can be incomplete if the run was interrupted:
+            if len(words) != 4 or line[-1] != '\n' or words[0] == 'id':
+                continue
+            if int(words[1]) == PROCESSED:
+                done[int(words[0])] = (int(words[2]), float(words[3]))
+    return done
+
+# Cube ids in the solving order:
+def cubes_order(cubes : list, is_sort : bool):
+    order = list(range(len(cubes)))
+    if is_sort:
+        order.sort(key=lambda i: -len(cubes[i]))
+    return order
+
+# Solve the CNF with a cube. The log is parsed on the fly, a model is
+# written to a file which is kept only for SAT:
+async def solve_cube(wu_id : int, cube : list):
+    global op
+    global base_cnf
+    global adapter
+    global solver_params
+    global cube_time_lim
+    clauses = [[lit] for lit in cube]
+    # A script solver needs a file and limits itself:
+    is_stdin = op.stdin and not adapter.needs_file
+    wall_limit = 0 if adapter.limits_itself else cube_time_lim
+    local_cnf_name = 'id-' + str(wu_id) + '-cnf'
+    solver_log = adapter.solver_log('id-' + str(wu_id) + '-model')
+    try:
+        if is_stdin:
+            sys_str = adapter.command('', solver_params, cube_time_lim)
+            run_stat = await solver_scheduler.run_cmd_stat(sys_str, dimacs.cnf_chunks(base_cnf, clauses), \
+                                                           wall_limit=wall_limit, parser=solver_log)
+        else:
+            with open(local_cnf_name, 'wb') as ofile:
+                await asyncio.to_thread(dimacs.write_cnf, ofile, base_cnf, clauses)
+            sys_str = adapter.command(local_cnf_name, solver_params, cube_time_lim)
+            run_stat = await solver_scheduler.run_cmd_stat(sys_str, wall_limit=wall_limit, parser=solver_log)
+    except asyncio.CancelledError:
+        remove_file(solver_log.model_name)
+        raise
+    finally:
+        remove_file(local_cnf_name)
+    if solver_log.answer != solver_adapters.SAT:
+        remove_file(solver_log.model_name)
+    return wu_id, run_stat, solver_log
+
+# Write a satisfying assignment, a CNF with the cube, and the cube's info:
+def write_sat(wu_id : int, cube : list, run_stat : solver_scheduler.RunStat, \
+              solver_log : solver_adapters.SolverLog):
+    global base_cnf
+    global postfix
+    global start_time
+    with open('!sat_info_cube_id_' + str(wu_id) + '_' + postfix, 'w') as ofile:
+        ofile.write('SAT\n')
+        ofile.write('elapsed : %d seconds\n' % int(time.time() - start_time))
+        ofile.write('solver time : %.3f s\n' % run_stat.wall_time)
+        ofile.write('cube id : %d\n' % wu_id)
+        ofile.write('cube : \n')
+        ofile.write(' '.join([str(lit) for lit in cube]) + '\n')
+    # The model file is absent if the solver printed no model:
+    out_name = '!sat_out_cube_id_' + str(wu_id) + '_' + postfix
+    if os.path.isfile(solver_log.model_name):
+        os.replace(solver_log.model_name, out_name)
+    else:
+        with open(out_name, 'w') as ofile:
+            ofile.write('s SATISFIABLE\n')
+    with open('!sat_cnf_cube_id_' + str(wu_id) + '_' + postfix, 'wb') as ofile:
+        dimacs.write_cnf(ofile, base_cnf, [[lit] for lit in cube])
+
+def print_stats():
+    global stats
+    print('sat-cubes : %d  unsat-cubes : %d  interr-cubes : %d' % \
+          (stats[SAT].count, stats[UNSAT].count, stats[INTERR].count))
+
+async def conquer(cubes : list, order : list, done : dict, info_file):
+    global op
+    global stats
+    global sat_ids
+    sched = solver_scheduler.Scheduler(op.cpu_num)
+    last_report_time = [time.time()]
+    def collect(res):
+        wu_id, run_stat, solver_log = res
+        result = log_result(solver_log)
+        done[wu_id] = (result, run_stat.wall_time)
+        info_file.write('%d %d %d %.3f\n' % (wu_id, PROCESSED, result, run_stat.wall_time))
+        stats[result].add(run_stat.wall_time)
+        if op.verb:
+            print('cube id %d : %s, %s' % (wu_id, RESULT_NAMES[result], str(run_stat)))
+        if time.time() - last_report_time[0] > REPORT_PERIOD:
+            last_report_time[0] = time.time()
+            print_stats()
+        if result == SAT:
+            sat_ids.append(wu_id)
+            print('SAT is found on cube id %d' % wu_id)
+            write_sat(wu_id, cubes[wu_id], run_stat, solver_log)
+            print_stats()
+            if not op.enum:
+                print('Stopping all runs')
+                for task in sched.tagged(lambda tag: True):
+                    task.cancel()
+    # Stop all runs if the script is terminated, results are kept:
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+    for sig in [signal.SIGTERM, signal.SIGINT]:
+        loop.add_signal_handler(sig, main_task.cancel)
+    try:
+        for wu_id in order:
+            if wu_id in done:
+                continue
+            await sched.acquire() # wait until any cpu is free
+            if len(sat_ids) > 0 and not op.enum:
+                sched.release()
+                break
+            sched.start(solve_cube(wu_id, cubes[wu_id]), collect, wu_id)
+        await sched.join()
+    except asyncio.CancelledError:
+        print('Terminated, stopping all runs')
+        await sched.cancel()
+
+# Write statistics in the format of conquer_mt:
+def write_progress(cubes_num : int, processed : int):
+    global postfix
+    global stats
+    global start_time
+    with open('!progress_' + postfix, 'w') as ofile:
+        ofile.write('***\n')
+        ofile.write('elapsed time    : %d\n' % int(time.time() - start_time))
+        ofile.write('cubes           : %d\n' % cubes_num)
+        ofile.write('processed cubes : %d, i.e. %.2f %%\n' % (processed, processed * 100.0 / cubes_num))
+        ofile.write('unsat_cubes     : %d\n' % stats[UNSAT].count)
+        ofile.write('sat_cubes       : %d\n' % stats[SAT].count)
+        ofile.write('interr_cubes    : %d\n' % stats[INTERR].count)
+        for result, name in [(UNSAT, 'unsat'), (SAT, 'sat'), (INTERR, 'interr')]:
+            stat = stats[result]
+            ofile.write(('min_time_' + name).ljust(16) + ': %.3f\n' % (stat.min if stat.count > 0 else -1))
+            ofile.write(('max_time_' + name).ljust(16) + ': %.3f\n' % (stat.max if stat.count > 0 else -1))
+            ofile.write(('avg_time_' + name).ljust(16) + ': %.3f\n' % (stat.mean if stat.count > 0 else -1))
+
+# Write cubes without UNSAT or SAT results in the cube file format:
+def write_interrupted_cubes(cubes : list, done : dict):
+    global postfix
+    with open('!interrupted_' + postfix, 'w') as ofile:
+        for wu_id in range(len(cubes)):
+            if wu_id in done and done[wu_id][0] != INTERR:
+                continue
+            ofile.write('a ' + ' '.join([str(lit) for lit in cubes[wu_id]]) + ' 0\n')
+
+if __name__ == '__main__':
+    if len(sys.argv) < 5:
+        print_usage()
+        exit(1)
+    solver = sys.argv[1]
+    cnf_name = sys.argv[2]
+    cubes_name = sys.argv[3]
+    cube_time_lim = int(sys.argv[4])
+    assert(cube_time_lim > 0)
+    op = Options()
+    op.read(sys.argv[5:])
+    print(op)
+
+    start_time = time.time()
+    adapter = solver_adapters.get_adapter(solver)
+    solver_params = ''
+    if op.param_file != '':
+        with open(op.param_file, 'r') as param_file:
+            solver_params = param_file.readline().strip()
+    print('solver : ' + adapter.command('<cnf>', solver_params, cube_time_lim))
+
+    cubes = cube_file.read_cubes(cubes_name)
+    assert(len(cubes) > 0)
+    print('cubes : %d' % len(cubes))
+    base_cnf = dimacs.read_cnf(cnf_name)
+    print(base_cnf)
+
+    postfix = clear_name(solver) + '_' + clear_name(cnf_name) + '_' + clear_name(cubes_name)
+    info_name = '!cubes_info_' + postfix
+    stats = dict([(result, OnlineStat()) for result in RESULT_NAMES])
+    sat_ids = []
+    done = dict()
+    if op.resume and os.path.isfile(info_name):
+        done = read_cubes_info(info_name)
+        for wu_id, (result, t) in done.items():
+            stats[result].add(t)
+            if result == SAT:
+                sat_ids.append(wu_id)
+        print('%d cubes were solved before resuming' % len(done))
+    else:
+        with open(info_name, 'w') as info_file:
+            info_file.write('id status result time\n')
+
+    if len(sat_ids) > 0 and not op.enum:
+        print('SAT was found before resuming on cube id %d' % sat_ids[0])
+    else:
+        order = cubes_order(cubes, op.sort)
+        # Results are written line by line to be kept after interruption:
+        with open(info_name, 'a', buffering=1) as info_file:
+            asyncio.run(conquer(cubes, order, done, info_file))
+
+    print_stats()
+    write_progress(len(cubes), len(done))
+    write_interrupted_cubes(cubes, done)
+    print('\nResult : ', end='')
+    if len(sat_ids) > 0:
+        print('SAT')
+    elif stats[UNSAT].count == len(cubes):
+        print('UNSAT')
+    else:
+        print('INTERRUPTED')
+    print('Elapsed : %d seconds' % int(time.time() - start_time))
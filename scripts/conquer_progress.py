@@ -0,0 +1,270 @@
+# Created on: 17 Oct 2026
+# Author: Oleg Zaikin
+# E-mail: zaikin.icc@gmail.com
+#
+# Reports progress of a running conquer phase: processed cubes, throughput in
+# cubes per hour, and the remaining time with a 95% confidence interval.
+# Results are read from one of the files:
+#   stdout of a running conquer_mt (redirected to a file) : its lines
+#     'sat-cubes : <int>  unsat-cubes : <int>  interr-cubes : <int>';
+#   !cubes_info_<postfix> of conquer.py, or of conquer_mt once it is finished :
+#     'id status result time';
+#   !processing_info of conquer_mpi : 'cube_id cube_result cube_time'.
+# The file is tailed: only new lines are read, unless it was rewritten (as
+# conquer_mpi does periodically), then it is read again. A file which does
+# not exist yet is reported as no progress.
+# conquer_mt prints no runtimes of cubes, so for it the remaining time is
+# estimated by the random sample if it is given, otherwise by the observed
+# throughput.
+#
+# Cubes are usually solved in order of their size, so processed cubes are not
+# a random sample. If sample_results_<cnf>.csv of find_cnc_threshold.py is
+# given, the total runtime is estimated by the random sample for the given n
+# and solver, and the remaining runtime is the total minus the processed one.
+# Otherwise, the remaining cubes are assumed to be like the processed ones.
+#
+# Example:
+#   python3 ./conquer_progress.py '!cubes_info_kissat_pcnf_cubes' -cubes=./cubes \
+#     -cpunum=64 -sample=sample_results_pcnf.csv -n=2000 -solver=kissat -period=600
+#   ./conquer kissat p.cnf cubes 5000 -cpunum=64 > conquer_out &
+#   python3 ./conquer_progress.py conquer_out -cpunum=64 -period=600
+#==============================================================================
+
+import sys
+import os
+import time
+import multiprocessing as mp
+import cube_file
+from online_stat import OnlineStat
+
+version = '0.0.3'
+script_name = 'conquer_progress.py'
+
+# Results of conquer_mt and conquer.py:
+UNSAT = 0
+SAT = 1
+INTERR = 2
+# Results of conquer_mpi:
+MPI_UNSAT = 2
+MPI_SAT = 3
+MPI_INDET = 4
+
+# Input options:
+class Options:
+    cubes = ''
+    cpu_num = mp.cpu_count()
+    sample_name = ''
+    n = -1
+    solver = ''
+    period = 0
+    def __str__(self):
+        s = 'cubes : ' + str(self.cubes) + '\n' +\
+        'cpu_num : ' + str(self.cpu_num) + '\n' +\
+        'sample_name : ' + str(self.sample_name) + '\n' +\
+        'n : ' + str(self.n) + '\n' +\
+        'solver : ' + str(self.solver) + '\n' +\
+        'period : ' + str(self.period) + '\n'
+        return s
+    def read(self, argv) :
+        for p in argv:
+            if '-cubes=' in p:
+                self.cubes = p.split('-cubes=')[1]
+            if '-cpunum=' in p:
+                self.cpu_num = int(p.split('-cpunum=')[1])
+            if '-sample=' in p:
+                self.sample_name = p.split('-sample=')[1]
+            if p[:3] == '-n=':
+                self.n = int(p.split('-n=')[1])
+            if '-solver=' in p:
+                self.solver = p.split('-solver=')[1]
+            if '-period=' in p:
+                self.period = int(p.split('-period=')[1])
+
+def print_usage():
+    print('Usage : ' + script_name + ' results-file [options]')
+    print('options :\n' +\
+    '-cubes=<str>    - (default : \'\')  cube file or the number of cubes; if not given, rows of the file' + '\n' +\
+    '-cpunum=<int>   - (default : ' + str(mp.cpu_count()) + ')  number of CPU cores of the conquer phase' + '\n' +\
+    '-sample=<str>   - (default : \'\')  sample_results_<cnf>.csv of find_cnc_threshold.py' + '\n' +\
+    '-n=<int>        - (default : -1)  threshold n of the sample; -1 - the only one' + '\n' +\
+    '-solver=<str>   - (default : \'\')  solver of the sample; \'\' - the only one' + '\n' +\
+    '-period=<int>   - (default : 0)  seconds between reports; 0 - report once')
+
+# Runtimes of a random sample for a pair (n, solver):
+def read_sample(sample_name : str, n : int, solver : str):
+    stats = dict()
+    with open(sample_name, 'r') as f:
+        for line in f:
+            words = line.split()
+            if len(words) not in [4, 7, 10] or line[-1] != '\n' or words[0] == 'n':
+                continue
+            pair = (int(words[0]), words[2])
+            if pair not in stats:
+                stats[pair] = OnlineStat()
+            stats[pair].add(float(words[3]))
+    pairs = [p for p in stats if (n < 0 or p[0] == n) and (solver == '' or p[1] == solver)]
+    assert len(pairs) == 1, 'choose one of the pairs (n, solver) by -n and -solver: ' + str(sorted(stats))
+    return pairs[0], stats[pairs[0]]
+
+# Results of a conquer phase which are read incrementally:
+class Progress:
+    def __init__(self, results_name : str):
+        self.name = results_name
+        self.reset()
+    def reset(self):
+        self.offset = 0
+        self.ino = -1
+        self.mtime = 0
+        self.is_mpi = False
+        self.is_mt_log = False
+        self.is_finished = False
+        self.rows = 0
+        self.done = 0
+        self.stat = OnlineStat() # runtimes of processed cubes
+        self.sat = 0
+        self.interr = 0
+    # Read new lines, or all lines if the file was rewritten:
+    def update(self):
+        try:
+            st = os.stat(self.name)
+        except FileNotFoundError: # not written yet
+            return
+        if st.st_ino != self.ino or st.st_size < self.offset or \
+           (self.is_mpi and st.st_mtime != self.mtime):
+            self.reset()
+            self.ino = st.st_ino
+        self.mtime = st.st_mtime
+        with open(self.name, 'rb') as f:
+            f.seek(self.offset)
+            for line in f:
+                # An incomplete line is read next time:
+                if line[-1:] != b'\n':
+                    break
+                self.offset += len(line)
+                self.add_line(line.split())
+    def add_line(self, words : list):
+        if len(words) > 0 and words[0] == b'cube_id':
+            self.is_mpi = True
+            return
+        # conquer_mt's stdout, its counters only grow, but lines of threads
+        # can be printed out of order:
+        if len(words) == 3 and words[0] == b'cubes' and words[1] == b':' and words[2].isdigit():
+            self.is_mt_log = True
+            self.rows = int(words[2])
+            return
+        if len(words) == 9 and words[0] == b'sat-cubes' and all([w.isdigit() for w in words[2::3]]):
+            self.is_mt_log = True
+            self.sat = max(self.sat, int(words[2]))
+            self.interr = max(self.interr, int(words[8]))
+            self.done = max(self.done, int(words[2]) + int(words[5]) + int(words[8]))
+            return
+        if self.is_mt_log:
+            # Some cubes are skipped once SAT is found:
+            if len(words) > 0 and words[0] == b'Result':
+                self.is_finished = True
+            return
+        if len(words) not in [3, 4] or not words[0].isdigit():
+            return
+        self.rows += 1
+        if self.is_mpi:
+            result = int(words[1])
+            if result not in [MPI_UNSAT, MPI_SAT, MPI_INDET]:
+                return
+            is_sat = result == MPI_SAT
+            is_interr = result == MPI_INDET
+        else:
+            # Status 1 means processed:
+            if int(words[1]) != 1:
+                return
+            result = int(words[2])
+            is_sat = result == SAT
+            is_interr = result == INTERR
+        self.stat.add(float(words[-1]))
+        self.done += 1
+        self.sat += int(is_sat)
+        self.interr += int(is_interr)
+
+# Remaining CPU time and its 95% confidence interval, -1 if unknown:
+def remaining_time(progress : Progress, cubes_num : int, sample : OnlineStat, cubes_per_hour : float):
+    global op
+    remaining = max(cubes_num - progress.done, 0)
+    if progress.stat.count < progress.done:
+        # Runtimes of processed cubes are unknown, the remaining cubes are
+        # assumed to be like the sample, or to be processed at the observed rate:
+        if sample is not None:
+            low, high = sample.ci()
+            return remaining * sample.mean, remaining * max(low, 0.0), remaining * high
+        if cubes_per_hour <= 0:
+            return -1.0, -1.0, -1.0
+        est = remaining * 3600.0 * op.cpu_num / cubes_per_hour
+        return est, est, est
+    done_sum = progress.stat.mean * progress.stat.count
+    if sample is not None:
+        low, high = sample.ci()
+        est = max(cubes_num * sample.mean - done_sum, 0.0)
+        return est, max(cubes_num * low - done_sum, 0.0), max(cubes_num * high - done_sum, 0.0)
+    if progress.stat.count == 0:
+        return -1.0, -1.0, -1.0
+    low, high = progress.stat.ci()
+    return remaining * progress.stat.mean, remaining * max(low, 0.0), remaining * high
+
+def report(progress : Progress, cubes_num : int, sample : OnlineStat, cubes_per_hour : float):
+    global op
+    done = progress.done
+    s = 'processed : %d of %d (%.2f %%), sat : %d, interrupted : %d' % \
+        (done, cubes_num, done * 100.0 / max(cubes_num, 1), progress.sat, progress.interr)
+    if progress.stat.count > 0:
+        s += ', mean time : %.2f' % progress.stat.mean
+    s += ', cubes/hour : %.1f' % cubes_per_hour
+    est, low, high = remaining_time(progress, cubes_num, sample, cubes_per_hour)
+    if est >= 0:
+        s += ', ETA : %.2f hours [%.2f, %.2f] on %d cores' % \
+             (est / op.cpu_num / 3600, low / op.cpu_num / 3600, high / op.cpu_num / 3600, op.cpu_num)
+    print(time.strftime('%Y-%m-%d %H:%M:%S') + ' ' + s, flush=True)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print_usage()
+        exit(1)
+    results_name = sys.argv[1]
+    op = Options()
+    op.read(sys.argv[2:])
+    print(op)
+
+    cubes_num = -1
+    if op.cubes.isdigit():
+        cubes_num = int(op.cubes)
+    elif op.cubes != '':
+        cubes_num = cube_file.count_cubes(op.cubes)
+    sample = None
+    if op.sample_name != '':
+        pair, sample = read_sample(op.sample_name, op.n, op.solver)
+        print('sample of n %d, solver %s : %d cubes, mean time %.2f, sd %.2f' % \
+              (pair[0], pair[1], sample.count, sample.mean, sample.sd()))
+
+    progress = Progress(results_name)
+    progress.update()
+    start_t = time.time()
+    start_done = progress.done
+    # Until the rate is observed, cores are assumed to be busy all the time:
+    cubes_per_hour = 0.0
+    if progress.stat.count > 0 and progress.stat.mean > 0:
+        cubes_per_hour = op.cpu_num * 3600.0 / progress.stat.mean
+    while True:
+        # conquer_mpi and conquer_mt write all cubes, conquer_mt's stdout
+        # has their number:
+        total = cubes_num if cubes_num > 0 else progress.rows
+        if not os.path.isfile(results_name):
+            print(time.strftime('%Y-%m-%d %H:%M:%S') + ' ' + results_name + ' is not written yet', flush=True)
+        else:
+            report(progress, total, sample, cubes_per_hour)
+        if op.period <= 0 or progress.is_finished or (total > 0 and progress.done >= total):
+            break
+        time.sleep(op.period)
+        progress.update()
+        # The rate is observed since the start of this script:
+        if progress.done > start_done:
+            cubes_per_hour = (progress.done - start_done) * 3600.0 / (time.time() - start_t)
+        else:
+            start_t = time.time()
+            start_done = progress.done
@@ -0,0 +1,186 @@
+# Created on: 17 Oct 2026
+# Author: Oleg Zaikin
+# E-mail: zaikin.icc@gmail.com
+#
+# Compact binary format of cube files with an index and mmap access.
+# A text cube file made by march_cu consists of lines 'a lit1 ... litk 0'.
+# Its binary version is:
+#   header   : magic 'CNCB', version, flags, cubes number, index offset;
+#   literals : int32 literals of all cubes, or, if the delta flag is set,
+#              zigzag varints of differences between consecutive literals;
+#   index    : int64 byte offsets of cubes' literals, cubes number + 1 values.
+# Cube i is thus accessed in O(1), and the file can be split into shards.
+# Numbers are stored in the native byte order.
+#
+# Example:
+#   python3 ./cube_file.py cubes_n_2000 cubes_n_2000.bin [--delta]
+# converts a text cube file to the binary format.
+#==============================================================================
+
+import sys
+import os
+import mmap
+import struct
+from array import array
+
+version = '0.0.1'
+script_name = 'cube_file.py'
+
+MAGIC = b'CNCB'
+FORMAT_VERSION = 1
+FLAG_DELTA = 1
+# magic, version, flags, cubes number, index offset:
+HEADER = struct.Struct('=4sIIQQ')
+
+def zigzag(x : int):
+    return (x << 1) if x >= 0 else ((-x << 1) - 1)
+
+def unzigzag(x : int):
+    return (x >> 1) if not x & 1 else -((x + 1) >> 1)
+
+# Encode literals as zigzag varints of differences:
+def encode_delta(cube : list):
+    res = bytearray()
+    prev = 0
+    for lit in cube:
+        z = zigzag(lit - prev)
+        prev = lit
+        while z >= 0x80:
+            res.append((z & 0x7f) | 0x80)
+            z >>= 7
+        res.append(z)
+    return bytes(res)
+
+def decode_delta(buf):
+    cube = []
+    prev = 0
+    z = 0
+    shift = 0
+    for b in buf:
+        z |= (b & 0x7f) << shift
+        if b & 0x80:
+            shift += 7
+            continue
+        prev += unzigzag(z)
+        cube.append(prev)
+        z = 0
+        shift = 0
+    return cube
+
+# Literals of a text line with a cube, 'a' and the trailing 0 are skipped:
+def parse_cube_line(line):
+    words = line.split()
+    if len(words) > 0 and words[0] in (b'a', 'a'):
+        words = words[1:]
+    if len(words) > 0 and words[-1] in (b'0', '0'):
+        words = words[:-1]
+    return [int(w) for w in words]
+
+# Check whether a file is a binary cube file:
+def is_binary(cubes_name : str):
+    with open(cubes_name, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+# Convert a text cube file to the binary one in one pass.
+# Returns the number of cubes:
+def convert(text_name : str, bin_name : str, delta=False):
+    index = array('q')
+    with open(text_name, 'rb') as ifile, open(bin_name, 'wb') as ofile:
+        ofile.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0, 0))
+        offset = HEADER.size
+        for line in ifile:
+            cube = parse_cube_line(line)
+            if len(cube) == 0:
+                continue
+            index.append(offset)
+            data = encode_delta(cube) if delta else array('i', cube).tobytes()
+            ofile.write(data)
+            offset += len(data)
+        index.append(offset)
+        ofile.write(index.tobytes())
+        ofile.seek(0)
+        cubes_num = len(index) - 1
+        ofile.write(HEADER.pack(MAGIC, FORMAT_VERSION, FLAG_DELTA if delta else 0, \
+                                cubes_num, offset))
+    return cubes_num
+
+# Memory-mapped binary cube file:
+class CubeFile:
+    def __init__(self, cubes_name : str):
+        self.name = cubes_name
+        with open(cubes_name, 'rb') as f:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, ver, self.flags, self.cubes_num, index_offset = \
+            HEADER.unpack_from(self.buf, 0)
+        assert(magic == MAGIC and ver == FORMAT_VERSION)
+        self.view = memoryview(self.buf)
+        self.index = self.view[index_offset:].cast('q')
+        assert(len(self.index) == self.cubes_num + 1)
+    def __len__(self):
+        return self.cubes_num
+    # Cube i as a list of int literals:
+    def cube(self, i : int):
+        if i < 0:
+            i += self.cubes_num
+        assert(i >= 0 and i < self.cubes_num)
+        s = self.index[i]
+        e = self.index[i+1]
+        if self.flags & FLAG_DELTA:
+            return decode_delta(self.buf[s:e])
+        return array('i', self.buf[s:e]).tolist()
+    def __getitem__(self, i : int):
+        return self.cube(i)
+    def __iter__(self):
+        for i in range(self.cubes_num):
+            yield self.cube(i)
+    # Indices of cubes of shard k out of shards_num equal shards:
+    def shard(self, k : int, shards_num : int):
+        assert(k >= 0 and k < shards_num)
+        return range(k * self.cubes_num // shards_num, \
+                     (k + 1) * self.cubes_num // shards_num)
+    def close(self):
+        self.index.release()
+        self.view.release()
+        self.buf.close()
+
+# Number of cubes in a text or binary cube file:
+def count_cubes(cubes_name : str):
+    if is_binary(cubes_name):
+        with open(cubes_name, 'rb') as f:
+            return HEADER.unpack(f.read(HEADER.size))[3]
+    cubes_num = 0
+    with open(cubes_name, 'rb') as f:
+        for line in f:
+            if line[:2] == b'a ':
+                cubes_num += 1
+    return cubes_num
+
+# Iterate over cubes of a text or binary cube file:
+def iter_cubes(cubes_name : str):
+    if is_binary(cubes_name):
+        cf = CubeFile(cubes_name)
+        for cube in cf:
+            yield cube
+        cf.close()
+    else:
+        with open(cubes_name, 'rb') as f:
+            for line in f:
+                cube = parse_cube_line(line)
+                if len(cube) > 0:
+                    yield cube
+
+# Read all cubes of a text or binary cube file:
+def read_cubes(cubes_name : str):
+    return list(iter_cubes(cubes_name))
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print('Usage: ' + script_name + ' text-cubes binary-cubes [--delta]')
+        exit(1)
+    text_name = sys.argv[1]
+    bin_name = sys.argv[2]
+    delta = '--delta' in sys.argv[3:]
+    cubes_num = convert(text_name, bin_name, delta)
+    print(str(cubes_num) + ' cubes were converted')
+    print('text size   : ' + str(os.path.getsize(text_name)) + ' bytes')
+    print('binary size : ' + str(os.path.getsize(bin_name)) + ' bytes')
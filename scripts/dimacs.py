@@ -0,0 +1,242 @@
+# Created on: 17 Oct 2026
+# Author: Oleg Zaikin
+# E-mail: zaikin.icc@gmail.com
+#
+# Streaming reader and writer of CNFs in the DIMACS format.
+# A CNF is scanned once as bytes (via mmap), and its header, comments, and
+# clauses are kept as byte ranges of the file. Thus a CNF "base CNF + extra
+# clauses" is written by block copying without re-tokenizing the base CNF.
+# As in the other scripts, each clause is assumed to be on its own line.
+#
+# Example:
+#   import dimacs
+#   cnf = dimacs.read_cnf('problem.cnf')
+#   print(cnf.vars_num, cnf.clause_lines)
+#   dimacs.add_cube('problem.cnf', 'problem_cube.cnf', ['-12', '345'])
+#==============================================================================
+
+import mmap
+import re
+
+version = '0.0.2'
+
+# Size of blocks in which clauses are copied and tokenized:
+CHUNK_SIZE = 1 << 22
+
+# Lines which are not clauses: comments, the header, the SATLIB end marker,
+# and empty lines.
+_special_line_re = re.compile(rb'^(?:[cp%][^\n]*|[ \t\r]*)(?:\n|\Z)', re.M)
+
+# CNF represented by byte ranges [start, end) of a buffer:
+class Cnf:
+    def __init__(self, buf, name=''):
+        self.name = name
+        self.buf = buf             # bytes, mmap, or any other buffer
+        self.vars_num = 0          # from the header
+        self.clauses_num = 0       # from the header
+        self.clause_lines = 0      # number of clauses actually found
+        self.header = None         # range of the 'p cnf' line
+        self.comments = []         # ranges of comment lines
+        self.clause_ranges = []    # ranges of contiguous clause blocks
+        self._block = None
+    def __str__(self):
+        return 'name : ' + self.name + '\n' +\
+        'vars_num : ' + str(self.vars_num) + '\n' +\
+        'clauses_num : ' + str(self.clauses_num) + '\n' +\
+        'clause_lines : ' + str(self.clause_lines) + '\n' +\
+        'comments : ' + str(len(self.comments)) + '\n'
+    # Size of the clause block in bytes:
+    def clause_bytes(self):
+        return sum(e - s for s, e in self.clause_ranges)
+    # All clauses as one bytes object which ends with a newline:
+    def clause_block(self):
+        if self._block is None:
+            view = memoryview(self.buf)
+            block = b''.join(view[s:e] for s, e in self.clause_ranges)
+            if len(block) > 0 and block[-1:] != b'\n':
+                block += b'\n'
+            self._block = block
+        return self._block
+    def close(self):
+        self._block = None
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+# Count lines in a range, the last one may be without a newline:
+def _count_lines(buf, start : int, end : int):
+    if end <= start:
+        return 0
+    if isinstance(buf, bytes):
+        cnt = buf.count(b'\n', start, end)
+    else:
+        view = memoryview(buf)
+        cnt = sum(bytes(view[i:min(i+CHUNK_SIZE, end)]).count(b'\n') \
+                  for i in range(start, end, CHUNK_SIZE))
+    if buf[end-1:end] != b'\n':
+        cnt += 1
+    return cnt
+
+# Scan a buffer with a CNF, only non-clause lines are inspected:
+def parse_cnf(buf, name=''):
+    cnf = Cnf(buf, name)
+    pos = 0
+    size = len(buf)
+    for m in _special_line_re.finditer(buf):
+        start, end = m.span()
+        if start == end:
+            continue
+        if start > pos:
+            cnf.clause_ranges.append((pos, start))
+            cnf.clause_lines += _count_lines(buf, pos, start)
+        pos = end
+        c = buf[start:start+1]
+        if c == b'c':
+            cnf.comments.append((start, end))
+        elif c == b'p':
+            words = bytes(buf[start:end]).split()
+            assert(cnf.header is None)
+            cnf.header = (start, end)
+            if len(words) == 4 and words[1] == b'cnf':
+                cnf.vars_num = int(words[2])
+                cnf.clauses_num = int(words[3])
+        elif c == b'%':
+            # SATLIB CNFs are finished by '%':
+            pos = size
+            break
+    if pos < size:
+        cnf.clause_ranges.append((pos, size))
+        cnf.clause_lines += _count_lines(buf, pos, size)
+    return cnf
+
+# Read a CNF from a file, the file is memory-mapped:
+def read_cnf(cnf_name : str):
+    with open(cnf_name, 'rb') as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # empty file
+            buf = b''
+    return parse_cnf(buf, cnf_name)
+
+# Clause as a DIMACS line, literals can be either int or str:
+def clause_line(clause):
+    return (' '.join([str(lit) for lit in clause]) + ' 0\n').encode()
+
+def clauses_bytes(clauses):
+    return b''.join([clause_line(cl) for cl in clauses])
+
+# Bytes of a CNF with the base CNF's clauses and extra clauses. They are
+# yielded by blocks of at most CHUNK_SIZE bytes, except the extra clauses.
+# If vars_num is 0, then the number of variables is taken from the base
+# CNF's header.
+def cnf_chunks(cnf : Cnf, clauses=[], vars_num=0):
+    if vars_num == 0:
+        vars_num = cnf.vars_num
+    yield b'p cnf %d %d\n' % (vars_num, cnf.clause_lines + len(clauses))
+    if cnf._block is not None:
+        view = memoryview(cnf._block)
+        for i in range(0, len(view), CHUNK_SIZE):
+            yield view[i:i+CHUNK_SIZE]
+    else:
+        view = memoryview(cnf.buf)
+        for s, e in cnf.clause_ranges:
+            for i in range(s, e, CHUNK_SIZE):
+                yield view[i:min(i+CHUNK_SIZE, e)]
+        if len(cnf.clause_ranges) > 0 and \
+           cnf.buf[cnf.clause_ranges[-1][1]-1:cnf.clause_ranges[-1][1]] != b'\n':
+            yield b'\n'
+    yield clauses_bytes(clauses)
+
+# Write the header, the base CNF's clauses, and extra clauses.
+# ofile must be opened in binary mode.
+def write_cnf(ofile, cnf : Cnf, clauses=[], vars_num=0):
+    for chunk in cnf_chunks(cnf, clauses, vars_num):
+        ofile.write(chunk)
+
+# Write a new CNF which consists of a given CNF and extra clauses:
+def add_clauses(old_cnf_name : str, new_cnf_name : str, clauses : list, vars_num=0):
+    cnf = read_cnf(old_cnf_name)
+    with open(new_cnf_name, 'wb') as ofile:
+        write_cnf(ofile, cnf, clauses, vars_num)
+    cnf.close()
+
+# Add cube to a CNF as one-literal clauses:
+def add_cube(old_cnf_name : str, new_cnf_name : str, cube : list):
+    add_clauses(old_cnf_name, new_cnf_name, [[lit] for lit in cube])
+
+# Iterate over clauses as lists of int literals (the trailing 0 excluded):
+def iter_clauses(cnf : Cnf):
+    view = memoryview(cnf.buf)
+    for s, e in cnf.clause_ranges:
+        i = s
+        while i < e:
+            j = min(i + CHUNK_SIZE, e)
+            chunk = bytes(view[i:j])
+            # Cut the chunk by the last complete line:
+            if j < e:
+                k = chunk.rfind(b'\n') + 1
+                if k > 0:
+                    chunk = chunk[:k]
+                    j = i + k
+            for line in chunk.split(b'\n'):
+                lits = line.split()
+                if len(lits) == 0:
+                    continue
+                if lits[-1] == b'0':
+                    lits.pop()
+                yield [int(x) for x in lits]
+            i = j
+
+# Iterate over comment lines as strings:
+def iter_comments(cnf : Cnf):
+    for s, e in cnf.comments:
+        yield bytes(cnf.buf[s:e]).decode().rstrip('\r\n')
+
+# Split clauses into the first k ones and the remaining ones.
+# Two Cnf with the same buffer are returned:
+def split_clauses(cnf : Cnf, k : int):
+    assert(k >= 0 and k <= cnf.clause_lines)
+    head = Cnf(cnf.buf, cnf.name)
+    tail = Cnf(cnf.buf, cnf.name)
+    for c in [head, tail]:
+        c.vars_num = cnf.vars_num
+        c.header = cnf.header
+        c.comments = cnf.comments
+    remain = k
+    for s, e in cnf.clause_ranges:
+        if remain == 0:
+            tail.clause_ranges.append((s, e))
+            continue
+        lines = _count_lines(cnf.buf, s, e)
+        if remain >= lines:
+            head.clause_ranges.append((s, e))
+            remain -= lines
+            continue
+        pos = s
+        for _ in range(remain):
+            pos = cnf.buf.find(b'\n', pos, e) + 1
+        head.clause_ranges.append((s, pos))
+        tail.clause_ranges.append((pos, e))
+        remain = 0
+    head.clause_lines = head.clauses_num = k
+    tail.clause_lines = tail.clauses_num = cnf.clause_lines - k
+    return head, tail
+
+# Maximal variable over all clauses:
+def max_var(cnf : Cnf):
+    m = 0
+    for clause in iter_clauses(cnf):
+        for lit in clause:
+            m = m if m >= abs(lit) else abs(lit)
+    return m
+
+# Read a satisfying assignment, i.e. literals from 'v ' lines of a solver's
+# output, the trailing 0 excluded:
+def read_model(file_name : str):
+    literals = []
+    with open(file_name, 'rb') as f:
+        for line in f:
+            if line[:2] == b'v ':
+                for x in line[2:].split():
+                    if x != b'0':
+                        literals.append(int(x))
+    return literals
@@ -16,22 +16,80 @@
 #     python3 ./find_cnc_threshold.py problem.cnf --stop_sat
 #  problem.cnf    : CNF.
 #  --stop_sat     : if a satisfying assignment is found, stop script.
-#==============================================================================
 #
-# TODO:
-# 0. Calculate estimation after processing samples.
+# In both modes, add --stdin to give CNFs with cubes to a CDCL solver via stdin,
+# then only CNFs with found satisfying assignments are written to files.
+# Add --bincubes to convert cube files to the binary indexed format of
+# cube_file.py, then random samples are taken in O(sample size).
+# Add --modelsearch to choose thresholds by a log-linear model of the number
+# of cubes instead of decreasing n by nstep until too many cubes are made.
+# Add --race to solve samples for all pairs (n, solver) at once and drop pairs
+# whose estimation is worse than the best one with 95% confidence.
+# Add --portfolio to run all CDCL solvers at once on each cube, the first
+# answer stops the other solvers on the cube (add --keepall to let them
+# finish). The time of the virtual best solver (VBS) on a cube is the minimal
+# time of the solvers, and its estimation is reported as the solver 'vbs'.
+#
+# Add --resume to continue an interrupted run (a crash or the script time limit).
+# Outcomes of lookahead runs, random samples, and stopped solvers are journaled
+# to checkpoint_<cnf>, while results on cubes are appended at once to
+# sample_results_<cnf>.csv, so finished work is not repeated.
+# Besides wall time, user and system CPU time, max RSS (in KB), and numbers of
+# conflicts, decisions, and propagations (-1 if unknown) of each CDCL
+# solver's run are written there. Solvers' logs are parsed on the fly by
+# adapters from solver_adapters.py, and models are written to files.
+# Add -maxconfl=<int> to estimate by conflicts instead of time: each CDCL
+# solver's run is limited by the given number of conflicts (-maxcdclt remains
+# a safety limit), and the cost of a cube is its number of conflicts, so
+# estimations do not depend on the load of the machine. The conflicts per
+# second of each solver are calibrated by CPU time of sampled runs, or given
+# by -conflrates=<solver>:<rate>,..., to report estimations in core-days.
+# Solvers without conflict limits (scripts) are not supported then, and the
+# VBS of the portfolio mode is estimated by time.
+# Free variables, which give the first threshold n, are counted after unit
+# propagation by unit_prop.py. Before a CDCL solver is run on a cube, the cube
+# is checked by unit propagation: a refuted cube is UNSAT in no time, while
+# literals of a cube which are implied by its other literals are dropped.
+# Add -lacache=<dir> to cache lookahead runs in a directory which can be shared
+# by runs on the same CNF (e.g. with other seeds), see lookahead_cache.py.
+#
+# Lookahead runs are started in parallel while their predicted memory fits
+# the memory budget (-maxmem, by default a part of available memory). Memory
+# of a run is predicted by the CNF's size, and then by finished runs.
+#
+# During sampling, estimations of the conquer phase for each pair (n, solver)
+# are updated online and rewritten periodically to est_<cnf> .
+#
+# Add -port=<int> to make the sampling phase a coordinator: workers on other
+# hosts (python3 ./sampling_net.py host:port -cpunum=<int> -token=<str>)
+# connect to this port, pull cubes and solvers, and push results back, see
+# sampling_net.py. Only local workers can connect unless -host=<str> is given
+# (e.g. -host=0.0.0.0). Workers must give the token of -token=<str>, a random
+# one is printed if it is not given.
+#==============================================================================
 
 import sys
 import os
+import shutil
 import time
 import multiprocessing as mp
 import random
+import math
 import collections
 import logging
-import time
+import asyncio
+import concurrent.futures
 from enum import Enum
+import dimacs
+import cube_file
+import solver_scheduler
+import lookahead_cache
+import sampling_net
+import solver_adapters
+import unit_prop
+from online_stat import OnlineStat
 
-version = "1.5.2"
+version = "1.21.8"
 
 # Input options:
 class Options:
@@ -40,16 +98,30 @@ class Options:
 	sample_size = 1000
 	min_cubes = 10000
 	max_cubes = 1000000
-	max_cubes_parallel = 10000000
 	min_refuted_leaves = 1000
 	max_la_time = 86400
+	max_mem = 0
 	max_cdcl_time = 5000
+	max_conflicts = 0
+	conflict_rates = dict()
 	max_script_time = 864000
 	nstep = 10
 	stop_sat = False
 	stop_time = False
+	stdin = False
+	bin_cubes = False
+	model_search = False
+	race = False
+	portfolio = False
+	keep_all = False
+	resume = False
 	param_file = ''
+	la_cache = ''
+	la_cache_size = 10
 	cpu_num = mp.cpu_count()
+	port = 0
+	host = sampling_net.DEFAULT_HOST
+	token = ''
 	seed = 0
 	def __str__(self):
 		s = 'la_solver : ' + str(self.la_solver) + '\n' +\
@@ -60,16 +132,29 @@ class Options:
 		'sample_size : ' + str(self.sample_size) + '\n' +\
 		'min_cubes : ' + str(self.min_cubes) + '\n' +\
 		'max_cubes : ' + str(self.max_cubes) + '\n' +\
-		'max_cubes_parallel : ' + str(self.max_cubes_parallel) + '\n' +\
 		'min_refuted_leaves : ' + str(self.min_refuted_leaves) + '\n' +\
 		'max_la_time : ' + str(self.max_la_time) + '\n' +\
+		'max_mem : ' + str(self.max_mem) + '\n' +\
 		'max_cdcl_time : ' + str(self.max_cdcl_time) + '\n' +\
+		'max_conflicts : ' + str(self.max_conflicts) + '\n' +\
+		'conflict_rates : ' + str(self.conflict_rates) + '\n' +\
 		'max_script_time : ' + str(self.max_script_time) + '\n' +\
 		'nstep : ' + str(self.nstep) + '\n' +\
 		'stop_sat : ' + str(self.stop_sat) + '\n' +\
 		'stop_time : ' + str(self.stop_time) + '\n' +\
+		'stdin : ' + str(self.stdin) + '\n' +\
+		'bin_cubes : ' + str(self.bin_cubes) + '\n' +\
+		'model_search : ' + str(self.model_search) + '\n' +\
+		'race : ' + str(self.race) + '\n' +\
+		'portfolio : ' + str(self.portfolio) + '\n' +\
+		'keep_all : ' + str(self.keep_all) + '\n' +\
+		'resume : ' + str(self.resume) + '\n' +\
 		'param_file : ' + str(self.param_file) + '\n' +\
+		'la_cache : ' + str(self.la_cache) + '\n' +\
+		'la_cache_size : ' + str(self.la_cache_size) + '\n' +\
 		'cpu_num : ' + str(self.cpu_num) + '\n' +\
+		'port : ' + str(self.port) + '\n' +\
+		'host : ' + str(self.host) + '\n' +\
 		'seed : ' + str(self.seed) + '\n'
 		return s
 	def read(self, argv) :
@@ -93,28 +178,61 @@ class Options:
 				self.min_cubes = int(p.split('-minc=')[1])
 			if '-maxc=' in p:
 				self.max_cubes = int(p.split('-maxc=')[1])
-			if '-maxcpar=' in p:
-				self.max_cubes_parallel = int(p.split('-maxcpar=')[1])
+			if '-maxmem=' in p:
+				self.max_mem = int(p.split('-maxmem=')[1])
 			if '-minref=' in p:
 				self.min_refuted_leaves = int(p.split('-minref=')[1])
 			if '-maxlat=' in p:
 				self.max_la_time = int(p.split('-maxlat=')[1])
 			if '-maxcdclt=' in p:
 				self.max_cdcl_time = int(p.split('-maxcdclt=')[1])
+			if '-maxconfl=' in p:
+				self.max_conflicts = int(p.split('-maxconfl=')[1])
+			# Parse comma-separated pairs solver:rate:
+			if '-conflrates=' in p:
+				for word in p.split('-conflrates=')[1].split(','):
+					if word == '':
+						continue
+					solver, rate = word.rsplit(':', 1)
+					self.conflict_rates[solver] = float(rate)
 			if '-maxt=' in p:
 				self.max_script_time = int(p.split('-maxt=')[1])
 			if '-nstep=' in p:
 				self.nstep = int(p.split('-nstep=')[1])
 			if '-param=' in p:
 				self.param_file = p.split('-param=')[1]
+			if '-lacache=' in p:
+				self.la_cache = p.split('-lacache=')[1]
+			if '-lacachegb=' in p:
+				self.la_cache_size = int(p.split('-lacachegb=')[1])
 			if '-cpunum=' in p:
 				self.cpu_num = int(p.split('-cpunum=')[1])
+			if '-port=' in p:
+				self.port = int(p.split('-port=')[1])
+			if '-host=' in p:
+				self.host = p.split('-host=')[1]
+			if '-token=' in p:
+				self.token = p.split('-token=')[1]
 			if '-seed=' in p:
 				self.seed = int(p.split('-seed=')[1])
 			if p == '--stop_sat':
 				self.stop_sat = True
 			if p == '--stop_time':
 				self.stop_time = True
+			if p == '--stdin':
+				self.stdin = True
+			if p == '--bincubes':
+				self.bin_cubes = True
+			if p == '--modelsearch':
+				self.model_search = True
+			if p == '--race':
+				self.race = True
+			if p == '--portfolio':
+				self.portfolio = True
+			if p == '--keepall':
+				self.keep_all = True
+			if p == '--resume':
+				self.resume = True
 
 def print_usage():
 	print('Usage : script cnf-name [options]')
@@ -124,47 +242,165 @@ def print_usage():
 	'-sample=<int>       - (default : 1000)     random sample size' + '\n' +\
 	'-minc=<int>         - (default : 10000)    minimal number of cubes' + '\n' +\
 	'-maxc=<int>         - (default : 1000000)  maximal number of cubes' + '\n' +\
-	'-maxcpar=<int>      - (default : 1000000)  maximal number of cubes processed in parallel' + '\n' +\
+	'-maxmem=<int>       - (default : 0)        memory budget in GB for lookahead runs; 0 - auto' + '\n' +\
 	'-minref=<int>       - (default : 1000)     minimal number of refuted leaves' + '\n' +\
 	'-maxlat=<int>       - (default : 86400)    time limit in seconds for lookahead solver' + '\n' +\
 	'-maxcdclt=<int>     - (default : 5000)     time limit in seconds for CDCL solver' + '\n' +\
+	'-maxconfl=<int>     - (default : 0)        conflicts limit for CDCL solver, estimate by conflicts; 0 - by time' + '\n' +\
+	'-conflrates=<str>   - (default : '')       comma-separated solver:conflicts-per-second; '' - calibrate' + '\n' +\
 	'-maxt=<int>         - (default : 864000)   script time limit in seconds' + '\n' +\
 	'-nstep=<int>        - (default : 10)       step for decreasing threshold n for lookahead solver' + '\n' +\
 	'-param=<str>        - (default : '')       file with parameters for CDCL solver' + '\n' +\
 	'-cpunum=<int>       - (default : ' + str(mp.cpu_count()) + '        number of used CPU cores' + '\n' +\
 	'-seed=<int>         - (default : time)     seed for pseudorandom generator' + '\n' +\
+	'-lacache=<str>      - (default : '')       directory for caching lookahead runs' + '\n' +\
+	'-lacachegb=<int>    - (default : 10)       maximal size in GB of the lookahead cache' + '\n' +\
+	'-port=<int>         - (default : 0)        port for remote sampling workers; 0 - no workers' + '\n' +\
+	'-host=<str>         - (default : 127.0.0.1) address on which workers are accepted' + '\n' +\
+	'-token=<str>        - (default : random)   token which workers must give' + '\n' +\
 	'--stop_time         - (default : False)    stop if CDCL solver is interrupted' + '\n' +\
-	'--stop_sat          - (default : False)    stop if a satisfying assignment is found' + '\n')
+	'--stop_sat          - (default : False)    stop if a satisfying assignment is found' + '\n' +\
+	'--stdin             - (default : False)    give CNFs with cubes to CDCL solver via stdin' + '\n' +\
+	'--bincubes          - (default : False)    convert cube files to binary indexed format' + '\n' +\
+	'--modelsearch       - (default : False)    choose thresholds by a model of cubes number' + '\n' +\
+	'--race              - (default : False)    drop (n, solver) pairs with clearly worse estimations' + '\n' +\
+	'--portfolio         - (default : False)    run all CDCL solvers at once on each cube' + '\n' +\
+	'--keepall           - (default : False)    in portfolio, do not stop solvers after the first answer' + '\n' +\
+	'--resume            - (default : False)    continue an interrupted run from its checkpoint' + '\n')
 
-# Kill unuseful processes after script termination:
-def kill_unuseful_processes(la_solver : str):
-	sys_str = 'killall -9 ' + la_solver
-	o = os.popen(sys_str).read()
-	sys_str = 'killall -9 timelimit'
-	o = os.popen(sys_str).read()
-
-# Kill a solver:
+# Cancel runs of a CDCL solver, only this script's runs are stopped:
 def kill_solver(solver : str):
-	# Kill only a binary solver, let a script solver finisn and clean:
-	if '.sh' not in solver:
-	    logging.info("Killing solver " + solver)
-	    sys_str = 'killall -9 ' + solver.replace('./','')
-	    o = os.popen(sys_str).read()
+	global cdcl_sched
+	if cdcl_sched is None:
+		return
+	tasks = cdcl_sched.tagged(lambda tag: tag[1] == solver)
+	logging.info('Cancelling %d runs of solver %s' % (len(tasks), solver))
+	for task in tasks:
+		task.cancel()
 
 # Remove file:
 def remove_file(file_name):
 	sys_str = 'rm -f ' + file_name
 	o = os.popen(sys_str).read()
 
-# Read free vars counted by march (they are different from the number of all variables):
-def get_march_free_vars_num(la_solver : str, cnf_name : str):
-  sys_str = la_solver + ' ' + cnf_name + ' -d 1'
-  o = os.popen(sys_str).read()
-  lines = o.split('\n')
-  for line in lines:
-    if 'c number of free variables = ' in line:
-      return int(line.split('c number of free variables = ')[1])
-  return -1
+# Append lines to the checkpoint file and flush them to disk:
+def write_checkpoint(lines : list):
+	global checkpoint_name
+	with open(checkpoint_name, 'a') as ofile:
+		ofile.write(''.join([line + '\n' for line in lines]))
+		ofile.flush()
+		os.fsync(ofile.fileno())
+
+# Read the checkpoint file of an interrupted run. Its lines are:
+#   n <n> <cubes> <refuted-leaves> <cubing-time> <cubes-file> - lookahead run;
+#   sample <n> <cube-index> <literals>                       - random cube;
+#   sampled <n> <sample size>                                - sample is complete;
+#   stop <solver>                                            - stopped solver.
+def read_checkpoint():
+	global checkpoint_name
+	global resumed_n
+	global resumed_samples
+	global stopped_solvers
+	if not os.path.isfile(checkpoint_name):
+		return
+	pending_samples = dict()
+	with open(checkpoint_name, 'r') as f:
+		for line in f:
+			words = line.split()
+			# Skip an incomplete last line:
+			if len(words) == 0 or line[-1] != '\n':
+				continue
+			if words[0] == 'n' and len(words) == 6:
+				n = int(words[1])
+				resumed_n[n] = (n, int(words[2]), int(words[3]), float(words[4]), words[5])
+			elif words[0] == 'sample':
+				n = int(words[1])
+				if n not in pending_samples:
+					pending_samples[n] = []
+				pending_samples[n].append(words[3:])
+			elif words[0] == 'sampled':
+				n = int(words[1])
+				if n in pending_samples and len(pending_samples[n]) == int(words[2]):
+					resumed_samples[n] = pending_samples[n]
+			elif words[0] == 'stop':
+				stopped_solvers.add(words[1])
+	logging.info('resumed lookahead runs : %d, resumed samples : %d, resumed stopped solvers : %d' % \
+	             (len(resumed_n), len(resumed_samples), len(stopped_solvers)))
+
+SAMPLE_HEADER = 'n cube-index solver time user-time sys-time max-rss conflicts decisions propagations\n'
+
+# Append a result on a cube to the file with results:
+def write_sample_result(n : int, cube_index : int, solver : str, run_stat : solver_scheduler.RunStat, \
+                        solver_log : solver_adapters.SolverLog):
+	global sample_name
+	with open(sample_name, 'a') as sample_file:
+		sample_file.write('%d %d %s %.2f %.2f %.2f %d %d %d %d\n' % (n, cube_index, solver, run_stat.wall_time, \
+		                  run_stat.user_time, run_stat.sys_time, run_stat.max_rss, \
+		                  solver_log.conflicts, solver_log.decisions, solver_log.propagations))
+		sample_file.flush()
+		os.fsync(sample_file.fileno())
+
+# Read results on cubes of an interrupted run. Only results for n whose
+# lookahead runs are resumed are used. The file is rewritten without
+# duplicates, a partly written last line, and (with -maxconfl) results
+# without conflicts, so cubes which are solved again are not duplicated:
+def read_sample_results():
+	global sample_name
+	global results
+	global estimates
+	global done_cubes
+	global cubes_num_n
+	header = SAMPLE_HEADER
+	kept_lines = []
+	seen = set()
+	with open(sample_name, 'r') as f:
+		for line in f:
+			words = line.split()
+			if len(words) > 0 and words[0] == 'n':
+				header = line
+				continue
+			# Results without CPU time and memory have 4 columns, without
+			# solvers' statistics - 7 columns:
+			if len(words) not in [4, 7, 10] or line[-1] != '\n':
+				continue
+			n = int(words[0])
+			cube_index = int(words[1])
+			solver = words[2]
+			solver_time = float(words[3])
+			cost = solver_time
+			if op.max_conflicts > 0:
+				# Runs without conflicts are solved again:
+				if len(words) < 10 or int(words[7]) < 0:
+					continue
+				cost = int(words[7])
+			if (n, cube_index, solver) in seen:
+				continue
+			seen.add((n, cube_index, solver))
+			kept_lines.append(line)
+			if n not in cubes_num_n:
+				continue
+			if op.max_conflicts > 0:
+				add_conflict_rate(solver, cost, float(words[4]) + float(words[5]))
+			if n not in results:
+				results[n] = []
+			results[n].append((cube_index,solver,solver_time))
+			if (n, solver) not in estimates:
+				estimates[(n, solver)] = OnlineStat()
+			estimates[(n, solver)].add(cost)
+			done_cubes.add((n, cube_index, solver))
+	part_name = sample_name + '.part'
+	with open(part_name, 'w') as ofile:
+		ofile.write(header)
+		ofile.writelines(kept_lines)
+		ofile.flush()
+		os.fsync(ofile.fileno())
+	os.replace(part_name, sample_name)
+	logging.info('resumed results on cubes : %d of %d kept results' % (len(done_cubes), len(kept_lines)))
+
+# Count free variables, i.e. ones which are not fixed by unit propagation and
+# occur in clauses which are not satisfied by it (as lookahead solvers do):
+def get_free_vars_num(cnf_name : str):
+	return get_base_prop(cnf_name).free_vars_num()
 
 # Parse lookahead solver's log:
 def parse_cubing_log(o):
@@ -177,106 +413,166 @@ def parse_cubing_log(o):
 			refuted_leaves = int(line.split(' refuted leaves')[0].split(' ')[-1])
 	return cubes, refuted_leaves
 
-# Add cube to a CNF as one-literal clauses:
-def add_cube(old_cnf_name : str, new_cnf_name : str, cube : list):
-	cnf_var_number = 0
-	clauses = []
-	with open(old_cnf_name, 'r') as cnf_file:
-		lines = cnf_file.readlines()
-		for line in lines:
-			if len(line) < 2 or line[0] == 'c':
-				continue
-			if line[0] == 'p':
-				cnf_var_number = line.split(' ')[2]
-			else:
-				clauses.append(line)
-	clauses_number = len(clauses) + len(cube)
-	#print('clauses_number : %d' % clauses_number)
-	with open(new_cnf_name, 'w') as cnf_file:
-		cnf_file.write('p cnf ' + str(cnf_var_number) + ' ' + str(clauses_number) + '\n')
-		for cl in clauses:
-			cnf_file.write(cl)
-		for c in cube:
-			cnf_file.write(c + ' 0\n')
-
-# Find a satisfying assignment in CDCL solver's log:
-def find_sat_log(o):
-	res = False
-	lines = o.split('\n')
-	for line in lines:
-		if len(line) < 12:
-			continue
-		if 's SATISFIABLE' in line:
-			res = True
-			break
-	return res
+# Random float from the open interval (0, 1):
+def random_open(rng):
+	u = 0.0
+	while u == 0.0:
+		u = rng.random()
+	return u
 
-# Generate a random sample of cubes:
-def get_random_cubes(cubes_name):
+# Generate a random sample of cubes in one pass over a cubes file via
+# reservoir sampling (Algorithm L), so only the sample is kept in memory.
+# The sample is reproducible for a given seed and n. The random cubes are
+# returned in the file's order together with their byte offsets in the file:
+def get_random_cubes(cubes_name : str, n : int):
 	global op
-	lines = []
-	random_cubes = []
-	remaining_cubes_str = []
-	with open(cubes_name, 'r') as cubes_file:
-		lines = cubes_file.readlines()
-		if len(lines) > op.sample_size:
-			random_lines = random.sample(lines, op.sample_size)
-			for line in random_lines:
-				lst = line.split(' ')[1:-1] # skip 'a' and '0'
-				random_cubes.append(lst)
-			remaining_cubes_str = [line for line in lines if line not in random_lines]
-		else:
-			logging.error('skip n: number of cubes is smaller than random sample size')
+	k = op.sample_size
+	rng = random.Random(str(op.seed) + '_' + str(n))
+	if cube_file.is_binary(cubes_name):
+		return get_random_cubes_bin(cubes_name, rng)
+	reservoir = [] # pairs (offset, line)
+	w = math.exp(math.log(random_open(rng)) / k)
+	next_index = k + int(math.log(random_open(rng)) / math.log(1 - w))
+	index = 0
+	offset = 0
+	with open(cubes_name, 'rb') as cubes_file:
+		for line in cubes_file:
+			if line[:2] == b'a ':
+				if index < k:
+					reservoir.append((offset, line))
+				elif index == next_index:
+					reservoir[rng.randrange(k)] = (offset, line)
+					w *= math.exp(math.log(random_open(rng)) / k)
+					next_index += int(math.log(random_open(rng)) / math.log(1 - w)) + 1
+				index += 1
+			offset += len(line)
+	if index <= k:
+		logging.error('skip n: number of cubes is smaller than random sample size')
+		return [], set()
+	reservoir.sort()
+	random_cubes = [line.decode().split()[1:-1] for _, line in reservoir] # skip 'a' and '0'
+	random_offsets = set([o for o, _ in reservoir])
+	return random_cubes, random_offsets
 
-	if len(random_cubes) > 0 and len(random_cubes) + len(remaining_cubes_str) != len(lines):
-		logging.error('incorrect number of of random and remaining cubes')
-		exit(1)
-	return random_cubes, remaining_cubes_str
+# Generate a random sample from a binary cube file by direct access to cubes.
+# Cubes' indices are returned instead of offsets:
+def get_random_cubes_bin(cubes_name : str, rng):
+	global op
+	cubes = cube_file.CubeFile(cubes_name)
+	if len(cubes) <= op.sample_size:
+		logging.error('skip n: number of cubes is smaller than random sample size')
+		cubes.close()
+		return [], set()
+	indices = sorted(rng.sample(range(len(cubes)), op.sample_size))
+	random_cubes = [[str(lit) for lit in cubes[i]] for i in indices]
+	cubes.close()
+	return random_cubes, set(indices)
+
+# Count cubes in a march_cu's output file, convert the file to the binary
+# format if needed. A cached file can be binary already:
+def count_cubes(cubes_name : str):
+	global op
+	if not op.bin_cubes or cube_file.is_binary(cubes_name):
+		return cube_file.count_cubes(cubes_name)
+	bin_name = cubes_name + '.bin'
+	real_cubes_num = cube_file.convert(cubes_name, bin_name)
+	os.replace(bin_name, cubes_name)
+	return real_cubes_num
+
+# Format of cube files for the lookahead cache:
+def cubes_format():
+	global op
+	return 'bin' if op.bin_cubes else 'text'
+
+# Check whether cubes for threshold n are useful for sampling:
+def is_useful_n(cubes_num : int, refuted_leaves : int):
+	global op
+	return cubes_num >= op.min_cubes and cubes_num <= op.max_cubes and \
+	       cubes_num >= op.sample_size and refuted_leaves >= op.min_refuted_leaves
 
 # Process a given threshold n:
-def process_n(n : int, cnf_name : str, op : Options):
+async def process_n(n : int, cnf_name : str, op : Options):
+	global la_cache
+	global march_mem_obs
+	global resumed_n
+	global resumed_samples
 	print('n : %d' % n)
-	start_t = time.time()
+	# A finished lookahead run is repeated only if its sample is lost:
+	if n in resumed_n:
+		res = resumed_n[n]
+		if n in resumed_samples or not is_useful_n(res[1], res[2]) or os.path.isfile(res[4]):
+			logging.info('n : %d is resumed from checkpoint' % n)
+			return res
+		del resumed_n[n]
 	cubes_name = './cubes_n_' + str(n) + '_' + cnf_name.replace('./','').replace('.cnf','')
-	system_str = 'timelimit -T 1 -t ' + str(int(op.max_la_time)) +  ' ' + op.la_solver + ' ' + cnf_name + \
-	' -n ' + str(n) + ' -o ' + cubes_name
-	out = os.popen(system_str).read()
+	if la_cache is not None:
+		info = await asyncio.to_thread(la_cache.get, cnf_name, n, op.la_solver, cubes_name, \
+		                               cubes_format(), op.max_la_time)
+		if info is not None:
+			real_cubes_num = await asyncio.to_thread(count_cubes, cubes_name)
+			assert(real_cubes_num == info[0])
+			return n, info[0], info[1], info[2], cubes_name
+	# A cubes file can be a link to a cached one, so it is not overwritten:
+	remove_file(cubes_name)
+	start_t = time.time()
+	system_str = op.la_solver + ' ' + cnf_name + ' -n ' + str(n) + ' -o ' + cubes_name
+	try:
+		run_stat = await solver_scheduler.run_cmd_stat(system_str, wall_limit=op.max_la_time)
+	except asyncio.CancelledError:
+		remove_file(cubes_name)
+		raise
 	t = time.time() - start_t
 	cubes_num = -1
 	refuted_leaves = -1
 	cubing_time = -1.0
-	cubes_num, refuted_leaves = parse_cubing_log(out)
-	real_cubes_num = 0
-	# Check that the real number of cubes matches with the declared number:
-	with open(cubes_name, 'r') as f:
-		lines = f.read().splitlines()
-		for line in lines:
-			if len(line) > 2 and line[:2] == 'a ':
-				real_cubes_num += 1
-	assert(real_cubes_num == cubes_num)
+	cubes_num, refuted_leaves = parse_cubing_log(run_stat.out)
+	march_mem_obs.append((n, cubes_num, run_stat.max_rss))
+	logging.info('n : %d, lookahead run : %s' % (n, str(run_stat)))
+	# Check that the real number of cubes matches with the declared number,
+	# there is nothing to check if the run was interrupted:
+	if cubes_num >= 0:
+		real_cubes_num = await asyncio.to_thread(count_cubes, cubes_name)
+		assert(real_cubes_num == cubes_num)
 	cubing_time = float(t)
+	if la_cache is not None and cubes_num >= 0:
+		await asyncio.to_thread(la_cache.put, cnf_name, n, op.la_solver, cubes_name, \
+		                        cubes_num, refuted_leaves, cubing_time, cubes_format())
 	return n, cubes_num, refuted_leaves, cubing_time, cubes_name
 
 # Collect result for threshold n:
 def collect_n_result(res):
 	global op
 	global random_cubes_n
+	global cubes_num_n
 	global cubes_num_lst
 	global exit_cubes_creating
+	global resumed_n
+	global resumed_samples
 	n = res[0]
 	cubes_num = res[1]
 	refuted_leaves = res[2]
 	cubing_time = res[3]
 	cubes_name = res[4]
-	if cubes_num >= op.min_cubes and cubes_num <= op.max_cubes and cubes_num >= op.sample_size and refuted_leaves >= op.min_refuted_leaves:
+	is_resumed = n in resumed_n
+	if not is_resumed:
+		write_checkpoint(['n %d %d %d %.2f %s' % (n, cubes_num, refuted_leaves, cubing_time, cubes_name)])
+	if is_useful_n(cubes_num, refuted_leaves):
 		logging.info(res)
-		ofile = open(stat_name,'a')
-		ofile.write('%d %d %d %.2f\n' % (n, cubes_num, refuted_leaves, cubing_time))
-		ofile.close()
+		if not is_resumed:
+			ofile = open(stat_name,'a')
+			ofile.write('%d %d %d %.2f\n' % (n, cubes_num, refuted_leaves, cubing_time))
+			ofile.close()
 		random_cubes = []
-		random_cubes, remaining_cubes_str = get_random_cubes(cubes_name)
+		if n in resumed_samples:
+			random_cubes = resumed_samples[n]
+		else:
+			random_cubes, random_offsets = get_random_cubes(cubes_name, n)
+			if len(random_cubes) > 0:
+				write_checkpoint(['sample %d %d %s' % (n, i, ' '.join(cube)) for i, cube in enumerate(random_cubes)] + \
+				                 ['sampled %d %d' % (n, len(random_cubes))])
 		if len(random_cubes) > 0: # if random sample is small enough to obtain it
 			random_cubes_n[n] = random_cubes
+			cubes_num_n[n] = cubes_num
 	else:
 		remove_file(cubes_name)
 	if cubes_num > op.max_cubes or cubing_time > op.max_la_time:
@@ -295,54 +591,178 @@ def stop_solver(solver : str, message : str, res=[]):
 	elapsed_time = time.time() - start_time
 	logging.info('elapsed_time : ' + str(elapsed_time))
 	stopped_solvers.add(solver)
+	write_checkpoint(['stop ' + solver])
 	logging.info('stopped solvers : ')
 	logging.info(stopped_solvers)
 	kill_solver(solver)
 
+# Base CNF, it is memory-mapped and read only once:
+base_cnf = None
+
+# Get the base CNF:
+def get_base_cnf(cnf_name : str):
+	global base_cnf
+	if base_cnf is None or base_cnf.name != cnf_name:
+		base_cnf = dimacs.read_cnf(cnf_name)
+	return base_cnf
+
+# Unit propagator of the base CNF, it is built only once:
+base_prop = None
+base_prop_name = ''
+
+# Get the unit propagator of the base CNF:
+def get_base_prop(cnf_name : str):
+	global base_prop
+	global base_prop_name
+	if base_prop is None or base_prop_name != cnf_name:
+		base_prop = unit_prop.Propagator.read(cnf_name)
+		base_prop_name = cnf_name
+	return base_prop
+
+# The propagator is not thread-safe, so cubes are propagated one by one in
+# a thread of their own, while the event loop keeps starting solvers:
+prop_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+# Check a cube by unit propagation. Returns (True, cube) if it is refuted,
+# otherwise (False, the cube without implied literals):
+def prefilter_cube(cnf_name : str, cube : list):
+	prop = get_base_prop(cnf_name)
+	if prop.refutes(cube):
+		return True, cube
+	return False, prop.reduce_cube(cube)
+
+# Write the base CNF with a cube as one-literal clauses to a file:
+def write_cnf_cube(new_cnf_name : str, cnf_name : str, cube : list):
+	with open(new_cnf_name, 'wb') as ofile:
+		dimacs.write_cnf(ofile, get_base_cnf(cnf_name), [[lit] for lit in cube])
+
 # Add cube to a CNF as one-literal clauses, run CDCL solver:
-def process_cube_solver(cnf_name : str, n : int, cube : list, cube_index : int, task_index : int, solver : str):
+async def process_cube_solver(cnf_name : str, n : int, cube : list, cube_index : int, task_index : int, solver : str):
 	global op
 	known_cube_cnf_name = './sample_cnf_n_' + str(n) + '_cube_' + str(cube_index) + '_task_' + str(task_index) + '.cnf'
-	add_cube(cnf_name, known_cube_cnf_name, cube)
+	adapter = solver_adapters.get_adapter(solver)
+	# A cube refuted by unit propagation is not given to the solver:
+	is_refuted, cube = await asyncio.get_running_loop().run_in_executor(prop_executor, \
+	                                                                   prefilter_cube, cnf_name, cube)
+	if is_refuted:
+		logging.info('n : %d, cube_index %d is refuted by unit propagation' % (n, cube_index))
+		solver_log = adapter.solver_log()
+		solver_log.answer = solver_adapters.UNSAT
+		for name in solver_adapters.STATS:
+			setattr(solver_log, name, 0)
+		return cnf_name, n, cube_index, solver, 0.0, False, solver_log, known_cube_cnf_name, \
+		       solver_scheduler.RunStat(), True
+	# A script solver needs a file, a binary one can read the CNF from stdin:
+	is_stdin = op.stdin and not adapter.needs_file
+	if not is_stdin:
+		await asyncio.to_thread(write_cnf_cube, known_cube_cnf_name, cnf_name, cube)
 
-	# Parse clasp's parameters:
 	solver_params = ''
-	if 'clasp' in solver:
-		clasp_config = 'auto'
-		clasp_enum = 'auto'
-		words = solver.split('-')
-		if len(words) > 1:
-			clasp_config = words[1]
-			solver = words[0]
-		if len(words) > 2:
-			clasp_enum = words[2]
-		solver_params = '--configuration=' + clasp_config + ' --enum-mode=' \
-			+ clasp_enum + ' --models=0'
-
 	if op.param_file != '':
 	    with open(op.param_file, 'r') as f:
 	      lines = f.read().splitlines()
 	      assert(len(lines) > 0)
-	      solver_params += lines[0]
-	if '.sh' in solver:
-		sys_str = solver + ' ' + known_cube_cnf_name + ' ' + str(op.max_cdcl_time)
-	else:
-		sys_str = 'timelimit -T 1 -t ' + str(op.max_cdcl_time) + ' ' + solver + \
-			' ' + solver_params + ' ' + known_cube_cnf_name
-	t = time.time()
-	cdcl_log = os.popen(sys_str).read()
-	t = time.time() - t
-	solver_time = float(t)
-	isSat = find_sat_log(cdcl_log)
+	      solver_params = lines[0]
+	if op.max_conflicts > 0:
+		solver_params = (solver_params + ' ' + adapter.conflict_limit(op.max_conflicts)).strip()
+	# A script solver limits itself, a binary one is limited here:
+	wall_limit = 0 if adapter.limits_itself else op.max_cdcl_time
+	sys_str = adapter.command('' if is_stdin else known_cube_cnf_name, solver_params, op.max_cdcl_time)
+	# The log is parsed on the fly, a model is written to a file:
+	solver_log = adapter.solver_log(known_cube_cnf_name + '.model')
+	try:
+		if is_stdin:
+			chunks = dimacs.cnf_chunks(get_base_cnf(cnf_name), [[lit] for lit in cube])
+			run_stat = await solver_scheduler.run_cmd_stat(sys_str, chunks, wall_limit=wall_limit, parser=solver_log)
+		else:
+			run_stat = await solver_scheduler.run_cmd_stat(sys_str, wall_limit=wall_limit, parser=solver_log)
+	except asyncio.CancelledError:
+		if not is_stdin:
+			remove_file(known_cube_cnf_name)
+		remove_file(solver_log.model_name)
+		raise
+	solver_time = run_stat.wall_time
+	isSat = solver_log.answer == solver_adapters.SAT
 	if not isSat:
 		# remove cnf with known cube
-		remove_file(known_cube_cnf_name)
-		cdcl_log = ''
-	return cnf_name, n, cube_index, solver, solver_time, isSat, cdcl_log, known_cube_cnf_name
+		if not is_stdin:
+			remove_file(known_cube_cnf_name)
+		remove_file(solver_log.model_name)
+	elif is_stdin:
+		# Keep the satisfiable CNF:
+		await asyncio.to_thread(write_cnf_cube, known_cube_cnf_name, cnf_name, cube)
+	return cnf_name, n, cube_index, solver, solver_time, isSat, solver_log, known_cube_cnf_name, run_stat, \
+	       solver_log.is_answered()
+
+# Period in seconds of rewriting the file with estimations:
+EST_WRITE_PERIOD = 60
+
+# Estimation of the conquer phase for remaining cubes on a given number of cores,
+# scale converts costs of cubes to seconds:
+def conquer_estimation(stat : OnlineStat, cubes_num : int, cores : int, scale=1.0):
+	remaining_cubes_num = max(cubes_num - stat.count, 0)
+	low, high = stat.ci()
+	return scale * stat.mean * remaining_cubes_num / cores, scale * max(low, 0.0) * remaining_cubes_num / cores, \
+	       scale * high * remaining_cubes_num / cores
+
+# Add conflicts and CPU time of a run to the calibration of a solver:
+def add_conflict_rate(solver : str, conflicts : int, cpu_time : float):
+	global conflict_rates
+	if conflicts < 0 or cpu_time <= 0:
+		return
+	if solver not in conflict_rates:
+		conflict_rates[solver] = [0, 0.0]
+	conflict_rates[solver][0] += conflicts
+	conflict_rates[solver][1] += cpu_time
+
+# Conflicts per second of a solver, 0 if unknown. A given rate is preferred
+# to the calibrated one:
+def conflict_rate(solver : str):
+	global op
+	global conflict_rates
+	if solver in op.conflict_rates:
+		return op.conflict_rates[solver]
+	if solver in conflict_rates and conflict_rates[solver][1] > 0:
+		return conflict_rates[solver][0] / conflict_rates[solver][1]
+	return 0.0
+
+# Seconds per unit of cost of a solver's run on a cube, 0 if unknown:
+def cost_scale(solver : str):
+	global op
+	if op.max_conflicts <= 0 or solver == VBS_NAME:
+		return 1.0
+	rate = conflict_rate(solver)
+	return 1.0 / rate if rate > 0 else 0.0
+
+# Rewrite the file with current estimations of all pairs (n, solver):
+def write_estimates():
+	global op
+	global estimates
+	global cubes_num_n
+	global est_name
+	global last_est_write_time
+	last_est_write_time = time.time()
+	part_name = est_name + '.part'
+	with open(part_name, 'w') as ofile:
+		# Means are in conflicts if runs are limited by conflicts:
+		if op.max_conflicts > 0:
+			ofile.write('n solver cubes solved mean-conflicts sd-conflicts conflicts-per-sec est-days-%dcores ci-low-days ci-high-days\n' % \
+			            op.cpu_num)
+		else:
+			ofile.write('n solver cubes solved mean sd est-days-%dcores ci-low-days ci-high-days\n' % op.cpu_num)
+		for (n, solver), stat in sorted(estimates.items()):
+			est, low, high = conquer_estimation(stat, cubes_num_n[n], op.cpu_num, cost_scale(solver))
+			rate = ''
+			if op.max_conflicts > 0:
+				rate = ' %.1f' % conflict_rate(solver)
+			ofile.write('%d %s %d %d %.4f %.4f%s %.4f %.4f %.4f\n' % (n, solver, cubes_num_n[n], stat.count, \
+			            stat.mean, stat.sd(), rate, est / 86400, low / 86400, high / 86400))
+	os.replace(part_name, est_name)
 
 # Collect a result obtained by CDCL solver on a CNF with cube:
 def collect_cube_solver_result(res):
 	global results
+	global estimates
 	global op
 	global start_time
 	cnf_name = res[0]
@@ -351,19 +771,40 @@ def collect_cube_solver_result(res):
 	solver = res[3]
 	solver_time = res[4]
 	isSat = res[5]
-	cdcl_log = res[6]
+	solver_log = res[6]
 	known_cube_cnf_name = res[7]
+	run_stat = res[8]
 	results[n].append((cube_index,solver,solver_time)) # append a tuple
-	logging.info('n : %d, got %d results - cube_index %d, solver %s, time %f' % (n, len(results[n]), cube_index, solver, solver_time))
+	write_sample_result(n, cube_index, solver, run_stat, solver_log)
+	logging.info('n : %d, got %d results - cube_index %d, solver %s, %s, %s' % (n, len(results[n]), cube_index, \
+	             solver, str(run_stat), str(solver_log)))
+	cost = solver_time
+	if op.max_conflicts > 0:
+		cost = solver_log.conflicts
+		add_conflict_rate(solver, solver_log.conflicts, run_stat.cpu_time())
+	# A run without conflicts (killed by -maxcdclt, or with short statistics)
+	# is not estimated, its cube is solved again on resume:
+	if cost < 0:
+		logging.error('n : %d, cube_index %d, solver %s : no conflicts, the result is not estimated' % \
+		              (n, cube_index, solver))
+	else:
+		if (n, solver) not in estimates:
+			estimates[(n, solver)] = OnlineStat()
+		estimates[(n, solver)].add(cost)
+	if time.time() - last_est_write_time > EST_WRITE_PERIOD:
+		write_estimates()
 	if isSat:
 		logging.info('*** SAT. Writing satisfying assignment to a file.')
 		elapsed_time = time.time() - start_time
 		logging.info('elapsed_time : ' + str(elapsed_time))
 		sat_name = cnf_name.replace('./','').replace('.cnf','') + '_n' + str(n) + '_' + solver + '_cube_index_' + str(cube_index) 
 		sat_name = sat_name.replace('./','')
-		with open('!sat_' + sat_name, 'w') as ofile:
-			ofile.write('*** SAT found\n')
-			ofile.write(cdcl_log)
+		with open('!sat_' + sat_name, 'wb') as ofile:
+			ofile.write(b'*** SAT found\n')
+			if os.path.isfile(solver_log.model_name):
+				with open(solver_log.model_name, 'rb') as model_file:
+					shutil.copyfileobj(model_file, ofile)
+		remove_file(solver_log.model_name)
 		# Copyt the SAT-CNF to a file that will not be deleted:
 		sat_cnf_name = '!cnf_' + sat_name
 		sys_str = 'cp ' + known_cube_cnf_name + ' ' + sat_cnf_name
@@ -373,61 +814,158 @@ def collect_cube_solver_result(res):
 			stop_solver(solver, 'SAT was found', res)
 	elif solver_time > op.max_cdcl_time and op.stop_time:
 		stop_solver(solver, 'CDCL solver reached time limit', res)
+	elif op.max_conflicts > 0 and not res[9] and solver_log.conflicts >= op.max_conflicts and op.stop_time:
+		stop_solver(solver, 'CDCL solver reached conflicts limit', res)
 
-# Main function:
-if __name__ == '__main__':
-	exit_cubes_creating = False
+# Least squares fit of y = a + b*x by points (x, y):
+def fit_linear(points : list):
+	xs = [float(p[0]) for p in points]
+	ys = [float(p[1]) for p in points]
+	mx = sum(xs) / len(xs)
+	my = sum(ys) / len(ys)
+	sxx = sum([(x - mx)**2 for x in xs])
+	if sxx == 0:
+		return my, 0.0
+	b = sum([(x - mx)*(y - my) for x, y in zip(xs, ys)]) / sxx
+	return my - b*mx, b
 
-	if len(sys.argv) < 2:
-		print_usage()
-		exit(1)
-	cnf_name = sys.argv[1]
+# Least squares fit of log(y) = a + b*n by points (n, y), y > 0:
+def fit_log_linear(points : list):
+	return fit_linear([(p[0], math.log(p[1])) for p in points])
 
-	op = Options()
-	op.read(sys.argv[2:])
-	print(op)
+# Until a lookahead run is finished, its memory is predicted by the CNF's size:
+MARCH_MEM_PER_CNF_BYTE = 10
+# Predicted memory is multiplied by this factor:
+MARCH_MEM_SAFETY = 1.25
+# Part of available memory used by lookahead runs if -maxmem is not given:
+MEM_BUDGET_FRACTION = 0.8
 
-	random.seed(op.seed)
-
-	log_name = './log_' + cnf_name.replace('./','').replace('.','')
-	print('log_name : ' + log_name)
-	logging.basicConfig(filename=log_name, filemode = 'w', level=logging.INFO)
-
-	logging.info('cnf : ' + cnf_name)
-	logging.info('total number of CPU cures: %d' % mp.cpu_count())
-	logging.info('used CPU cores : %d' % op.cpu_num)
-	logging.info('Options: \n' + str(op))
-
-	start_time = time.time()
+# Predict memory in KB of a lookahead run on threshold n. The maximal memory
+# of finished runs is taken, unless memory grows with the number of cubes,
+# then the number of cubes for n is predicted by the log-linear model:
+def predict_march_mem(cnf_name : str, n : int):
+	global op
+	global march_mem_obs
+	if len(march_mem_obs) == 0:
+		return int(MARCH_MEM_SAFETY * MARCH_MEM_PER_CNF_BYTE * os.path.getsize(cnf_name) / 1024)
+	mem = max([o[2] for o in march_mem_obs])
+	finished = [o for o in march_mem_obs if o[1] > 0]
+	if len(set([o[1] for o in finished])) >= 2 and len(set([o[0] for o in finished])) >= 2:
+		a, b = fit_log_linear([(o[0], o[1]) for o in finished])
+		cubes_num = min(math.exp(min(a + b*n, 700.0)), op.max_cubes)
+		c, d = fit_linear([(o[1], o[2]) for o in finished])
+		if d > 0:
+			mem = max(mem, c + d*cubes_num)
+	return int(MARCH_MEM_SAFETY * mem)
 
-	# Count free variables:
-	free_vars_num = get_march_free_vars_num(op.la_solver, cnf_name)
-	logging.info('free vars : %d' % free_vars_num)
-	n = free_vars_num
-	while n % op.nstep != 0 and n > 0:
-		n -= 1
-	logging.info('start n : %d ' % n)
+# Number of points nearest to the window which are used for fitting:
+MODEL_POINTS = 4
+# Maximal step of probing runs in units of nstep:
+MAX_PROBE_STEP = 8
 
-	# Prepare an output file:
-	stat_name = 'stat_' + cnf_name
-	stat_name = stat_name.replace('.','')
-	stat_name = stat_name.replace('/','')
-	stat_file = open(stat_name,'w')
-	stat_file.write('n cubes refuted-leaves cubing-time\n')
-	stat_file.close()
+# Choose thresholds n for next lookahead runs given results of finished runs.
+# observed : dict n -> (cubes_num, cubing_time), tried : set of started n.
+def model_candidates(n_start : int, observed : dict, tried : set):
+	global op
+	usable = sorted([(n, r[0]) for n, r in observed.items() if r[0] >= 2])
+	points = usable[:MODEL_POINTS]
+	a, b = fit_log_linear(points) if len(points) >= 2 else (0.0, 0.0)
+	# Probe lower n until the number of cubes starts growing:
+	if b >= 0.0:
+		if len(tried) > len(observed):
+			return [] # wait for a running probe
+		step = op.nstep
+		if len(usable) == 0:
+			step *= min(2**len(tried), MAX_PROBE_STEP)
+		n = min(tried) - step
+		return [n] if n > 0 else []
+	time_points = [(n, observed[n][1]) for n, _ in points if observed[n][1] > 0]
+	a_t, b_t = fit_log_linear(time_points) if len(time_points) >= 2 else (0.0, 0.0)
+	grid = [n for n in range(n_start, 0, -op.nstep)]
+	predicted = dict([(n, math.exp(min(a + b*n, 700.0))) for n in grid])
+	window = [n for n in grid if predicted[n] >= op.min_cubes and predicted[n] <= op.max_cubes]
+	if len(window) == 0:
+		# The window is between two neighbour n, bracket it:
+		window = [n for n in grid if predicted[n] < op.min_cubes][-1:] + \
+		         [n for n in grid if predicted[n] > op.max_cubes][:1]
+	else:
+		# Bracket the window from above, and from below if the model is unsure:
+		window.append(max(window) + op.nstep)
+		if predicted.get(min(window) - op.nstep, 0) <= 2*op.max_cubes:
+			window.append(min(window) - op.nstep)
+	candidates = []
+	for n in sorted(set(window), reverse=True):
+		if n not in predicted or n in tried:
+			continue
+		# The number of cubes is monotone on n:
+		if any([m >= n and r[0] > op.max_cubes for m, r in observed.items()]):
+			continue
+		if any([m <= n and 0 <= r[0] < op.min_cubes for m, r in observed.items()]):
+			continue
+		if b_t != 0.0 and math.exp(min(a_t + b_t*n, 700.0)) > op.max_la_time:
+			continue
+		candidates.append(n)
+	return candidates
 
-	random_cubes_n = dict()
-	cubes_num_lst = []
-	# Use 1 CPU core if many cubes (too much RAM):
-	if op.max_cubes > op.max_cubes_parallel:
-		pool = mp.Pool(1)
+# Find required n by lookahead runs on thresholds chosen by a model:
+async def model_cubing_phase(cnf_name : str, n_start : int):
+	global op
+	global mem_budget
+	sched = solver_scheduler.Scheduler(op.cpu_num, mem_budget)
+	observed = dict()
+	tried = set()
+	def collect(res):
+		observed[res[0]] = (res[1], res[3])
+		collect_n_result(res)
+	candidates = [n_start]
+	while True:
+		if len(candidates) > 0:
+			n = candidates.pop(0)
+			mem = predict_march_mem(cnf_name, n)
+			await sched.acquire(mem) # wait until any cpu and enough memory are free
+			tried.add(n)
+			sched.start(process_n(n, cnf_name, op), collect, mem=mem)
+		elif sched.running() > 0:
+			await asyncio.wait(set(sched.tasks), return_when=asyncio.FIRST_COMPLETED)
+			sched.check()
+		else:
+			break
+		candidates = model_candidates(n_start, observed, tried)
+	# The linear sweep makes runs from n_start until too many cubes:
+	exceeded = [n for n, r in observed.items() if r[0] > op.max_cubes]
+	usable = sorted([(n, r[0]) for n, r in observed.items() if r[0] >= 2])
+	if len(exceeded) > 0:
+		n_stop = max(exceeded)
+	elif len(usable) >= 2:
+		a, b = fit_log_linear(usable[:MODEL_POINTS])
+		n_stop = min(tried)
+		while n_stop > op.nstep and math.exp(min(a + b*n_stop, 700.0)) <= op.max_cubes:
+			n_stop -= op.nstep
 	else:
-		pool = mp.Pool(op.cpu_num)
-	# Find required n and their cubes numbers:
+		n_stop = min(tried)
+	linear_runs = (n_start - n_stop) // op.nstep + 1
+	s = 'model-guided search : %d lookahead runs, linear sweep : about %d runs, saved : %d' % \
+	    (len(tried), linear_runs, linear_runs - len(tried))
+	logging.info(s)
+	print(s)
+	print('Stop cubing phase')
+
+# Find required n and their cubes numbers:
+async def cubing_phase(cnf_name : str, n : int):
+	global op
+	global cubes_num_lst
+	global exit_cubes_creating
+	global mem_budget
+	sched = solver_scheduler.Scheduler(op.cpu_num, mem_budget)
 	while not exit_cubes_creating:
-		pool.apply_async(process_n, args=(n, cnf_name, op), callback=collect_n_result)
-		while len(pool._cache) >= op.cpu_num: # wait until any cpu is free
-			time.sleep(2)
+		mem = predict_march_mem(cnf_name, n)
+		await sched.acquire(mem) # wait until any cpu and enough memory are free
+		if exit_cubes_creating:
+			sched.release(mem)
+			break
+		logging.info('n : %d, predicted lookahead memory : %d KB, used : %d KB of %d KB' % \
+		             (n, mem, sched.used_mem, mem_budget))
+		sched.start(process_n(n, cnf_name, op), collect_n_result, mem=mem)
 		n -= op.nstep
 		if len(cubes_num_lst) >= 2:
 			next_predicted_cubes_num = cubes_num_lst[-1] / cubes_num_lst[-2]
@@ -440,53 +978,62 @@ if __name__ == '__main__':
 				logging.info('Stop due to high next cubes num')
 				print('Stop due to high next cubes num')
 				exit_cubes_creating = True
-		if exit_cubes_creating or n <= 0:
-			time.sleep(2) # wait for la completion
-			#pool.terminate()
-			logging.info('Stop cubing phase. Last cubes nums are ' + str(cubes_num_lst[-2]) + ', ' + str(cubes_num_lst[-1]))
-			print('Stop cubing phase')
-			logging.info('killing unuseful processes')
-			kill_unuseful_processes(op.la_solver)
-			time.sleep(2) # wait for processes' termination
+		if n <= 0:
 			break
+	if exit_cubes_creating:
+		# Lookahead runs on lower n give even more cubes:
+		logging.info('killing %d unuseful lookahead runs' % sched.running())
+		await sched.cancel()
+		sched.check()
+	else:
+		await sched.join()
+	logging.info('Stop cubing phase. Last cubes nums are ' + str(cubes_num_lst[-2:]))
+	print('Stop cubing phase')
 
-	elapsed_time = time.time() - start_time
-	logging.info('elapsed_time : ' + str(elapsed_time))
-	logging.info('random_cubes_n : ')
-
-	pool.close()
-	pool.join()
-
-	pool2 = mp.Pool(op.cpu_num)
+# Accept remote workers during a sampling phase if needed:
+async def start_coordinator(sched : solver_scheduler.Scheduler):
+	global op
+	global coordinator
+	global cnf_name
+	if op.port > 0:
+		if op.token == '':
+			op.token = sampling_net.new_token()
+			print('workers must be run with -token=' + op.token)
+		coordinator = sampling_net.Coordinator(sched, cnf_name, sys.argv[2:], process_cube_solver, op.token)
+		await coordinator.start(op.host, op.port)
 
-	# Prepare file for results:
-	sample_name = 'sample_results_' + cnf_name
-	sample_name = sample_name.replace('.','')
-	sample_name = sample_name.replace('/','')
-	sample_name += '.csv'
-	with open(sample_name, 'w') as sample_file:
-		sample_file.write('n cube-index solver time\n')
-	# Sort dict by n in descending order:
-	sorted_random_cubes_n = collections.OrderedDict(sorted(random_cubes_n.items()))
+async def stop_coordinator():
+	global coordinator
+	if coordinator is not None:
+		await coordinator.close()
+		coordinator = None
 
-	logging.info('sorted_random_cubes_n : ')
-	logging.info(sorted_random_cubes_n)
-	# for evary n solve cube-problems from the random sample:
-	logging.info('')
-	logging.info('processing random samples')
-	logging.info('')
+# Solve a CNF with a cube on a local core or on a remote worker:
+async def solve_cube(cnf_name : str, n : int, cube : list, cube_index : int, task_index : int, solver : str):
+	global coordinator
+	if coordinator is not None:
+		return await coordinator.solve(cnf_name, n, cube, cube_index, task_index, solver)
+	return await process_cube_solver(cnf_name, n, cube, cube_index, task_index, solver)
 
+# For every n solve cube-problems from the random sample:
+async def sampling_phase(cnf_name : str, sorted_random_cubes_n : dict):
+	global op
+	global results
+	global stopped_solvers
+	global start_time
+	global cdcl_sched
+	sched = solver_scheduler.Scheduler(op.cpu_num)
+	cdcl_sched = sched
+	await start_coordinator(sched)
 	solvers = op.cdcl_solvers
-
-	stopped_solvers = set()
-	results = dict()
 	isExit = False
 	for n, random_cubes in sorted_random_cubes_n.items():
 		if isExit:
 				break
 		logging.info('*** n : %d' % n)
 		logging.info('random_cubes size : %d' % len(random_cubes))
-		results[n] = []
+		if n not in results:
+			results[n] = []
 		task_index = 0
 
 		for solver in solvers:
@@ -497,22 +1044,26 @@ if __name__ == '__main__':
 			if solver in stopped_solvers:
 				continue
 			cube_index = 0
-			exit_solving = False
 			for cube in random_cubes:
-				while len(pool2._cache) >= op.cpu_num:
-					time.sleep(2)
+				# Skip a cube solved before resuming:
+				if (n, cube_index, solver) in done_cubes:
+					cube_index += 1
+					continue
+				await sched.acquire() # wait until any cpu is free
 				# Break if solver becomes a stopped one.
 				if solver in stopped_solvers:
+					sched.release()
 					break
 				# Break if script time limit is reached:
 				if time.time() - start_time > op.max_script_time:
 					logging.info('Script time limit it reached, stop.')
+					sched.release()
 					isExit = True
 					break
-				pool2.apply_async(process_cube_solver, args=(cnf_name, n, cube, cube_index, task_index, solver), callback=collect_cube_solver_result)
+				sched.start(solve_cube(cnf_name, n, cube, cube_index, task_index, solver), \
+				            collect_cube_solver_result, (n, solver))
 				task_index += 1
 				cube_index += 1
-		time.sleep(2)
 		logging.info('results[n] len : %d' % len(results[n]))
 		#logging.info(results[n])
 		elapsed_time = time.time() - start_time
@@ -521,20 +1072,333 @@ if __name__ == '__main__':
 		if len(stopped_solvers) == len(solvers):
 			logging.info('stop main loop')
 			break
+	await sched.join()
+	await stop_coordinator()
 
-	pool2.close()
-	pool2.join()
+# Minimal number of solved cubes of a pair (n, solver) to drop it in racing:
+RACE_MIN_SAMPLES = 30
+
+# Bounds of the conquer phase estimation in seconds for a pair (n, solver):
+def race_bounds(stat : OnlineStat, cubes_num : int, scale=1.0):
+	low, high = stat.ci()
+	return scale * max(low, 0.0) * cubes_num, scale * high * cubes_num
+
+# Drop pairs (n, solver) whose lower bound is worse than the best upper bound:
+def race_drop_pairs(dropped : set, sched : solver_scheduler.Scheduler):
+	global cubes_num_n
+	global estimates
+	bounds = dict()
+	for pair, stat in estimates.items():
+		# Costs of a solver without a conflicts rate are not comparable:
+		if pair not in dropped and stat.count >= RACE_MIN_SAMPLES and cost_scale(pair[1]) > 0:
+			bounds[pair] = race_bounds(stat, cubes_num_n[pair[0]], cost_scale(pair[1]))
+	if len(bounds) < 2:
+		return
+	best_pair = min(bounds, key=lambda p: bounds[p][1])
+	best_high = bounds[best_pair][1]
+	for pair, (low, high) in bounds.items():
+		if low > best_high:
+			dropped.add(pair)
+			logging.info('race: drop n %d solver %s, estimation in [%.2f, %.2f], best is n %d solver %s with upper bound %.2f' % \
+			             (pair[0], pair[1], low, high, best_pair[0], best_pair[1], best_high))
+			# Free cores of the dropped pair:
+			for task in sched.tagged(lambda tag: tag == pair):
+				task.cancel()
+
+# Solve random samples for all pairs (n, solver) at once. Free cores are given
+# to the surviving pair with the fewest started cubes:
+async def racing_sampling_phase(cnf_name : str, sorted_random_cubes_n : dict):
+	global op
+	global results
+	global stopped_solvers
+	global start_time
+	global cdcl_sched
+	sched = solver_scheduler.Scheduler(op.cpu_num)
+	cdcl_sched = sched
+	await start_coordinator(sched)
+	pairs = []
+	orders = dict()
+	for n, random_cubes in sorted_random_cubes_n.items():
+		if n not in results:
+			results[n] = []
+		# Cubes are solved in random order to get unbiased estimations early:
+		order = list(range(len(random_cubes)))
+		random.Random(str(op.seed) + '_race_' + str(n)).shuffle(order)
+		orders[n] = order
+		for solver in op.cdcl_solvers:
+			pairs.append((n, solver))
+	started = dict([(pair, 0) for pair in pairs])
+	dropped = set()
+	def collect(res):
+		collect_cube_solver_result(res)
+		race_drop_pairs(dropped, sched)
+	task_index = 0
+	while True:
+		await sched.acquire() # wait until any cpu is free
+		alive = [p for p in pairs if p not in dropped and p[1] not in stopped_solvers \
+		         and started[p] < len(orders[p[0]])]
+		if len(alive) == 0:
+			sched.release()
+			break
+		# Break if script time limit is reached:
+		if time.time() - start_time > op.max_script_time:
+			logging.info('Script time limit it reached, stop.')
+			sched.release()
+			break
+		pair = min(alive, key=lambda p: started[p])
+		n, solver = pair
+		cube_index = orders[n][started[pair]]
+		started[pair] += 1
+		# Skip a cube solved before resuming:
+		if (n, cube_index, solver) in done_cubes:
+			sched.release()
+			continue
+		sched.start(solve_cube(cnf_name, n, sorted_random_cubes_n[n][cube_index], \
+		            cube_index, task_index, solver), collect, pair)
+		task_index += 1
+	await sched.join()
+	await stop_coordinator()
+	logging.info('race: %d pairs out of %d were dropped' % (len(dropped), len(pairs)))
+	for pair in pairs:
+		if pair not in dropped and pair in estimates:
+			low, high = race_bounds(estimates[pair], cubes_num_n[pair[0]], cost_scale(pair[1]))
+			logging.info('race: n %d solver %s, %d cubes solved, estimation in [%.2f, %.2f]' % \
+			             (pair[0], pair[1], estimates[pair].count, low, high))
 
-	# Kill remaining processes if any:
-	kill_unuseful_processes(op.la_solver)
-	for solver in solvers:
-		kill_solver(solver)
+# Name of the virtual best solver in estimations:
+VBS_NAME = 'vbs'
+
+# Solve each cube of random samples by all CDCL solvers at once. Unless
+# --keepall, the first answer on a cube cancels the other solvers' runs on it,
+# so per-solver estimations consist of cubes won by a solver (and of runs
+# without answers), while the VBS estimation is unbiased:
+async def portfolio_sampling_phase(cnf_name : str, sorted_random_cubes_n : dict):
+	global op
+	global results
+	global estimates
+	global stopped_solvers
+	global start_time
+	global cdcl_sched
+	sched = solver_scheduler.Scheduler(op.cpu_num)
+	cdcl_sched = sched
+	await start_coordinator(sched)
+	wins = collections.Counter()
+	def add_vbs(n : int, t : float):
+		if (n, VBS_NAME) not in estimates:
+			estimates[(n, VBS_NAME)] = OnlineStat()
+		estimates[(n, VBS_NAME)].add(t)
+	# All runs on a cube are finished, the fastest answer wins:
+	def finish(race : dict, n : int):
+		race['done'] = True
+		if len(race['times']) == 0:
+			return
+		answered = [x for x in race['times'] if x[2]]
+		t, solver, is_answered = min(answered if len(answered) > 0 else race['times'])
+		if is_answered:
+			wins[(n, solver)] += 1
+		add_vbs(n, t)
+	def collect(res, race : dict):
+		n = res[1]
+		cube_index = res[2]
+		collect_cube_solver_result(res)
+		if res[5] and op.stop_sat:
+			for solver in op.cdcl_solvers:
+				if solver not in stopped_solvers:
+					stop_solver(solver, 'SAT was found by portfolio', res)
+		race['left'] -= 1
+		race['times'].append((res[4], res[3], res[9]))
+		if race['done']:
+			return
+		if res[9] and not op.keep_all:
+			race['done'] = True
+			wins[(n, res[3])] += 1
+			add_vbs(n, res[4])
+			for task in sched.tagged(lambda tag: tag[0] == n and tag[2] == cube_index):
+				task.cancel()
+		elif race['left'] == 0:
+			finish(race, n)
+	task_index = 0
+	isExit = False
+	for n, random_cubes in sorted_random_cubes_n.items():
+		if isExit:
+			break
+		logging.info('*** n : %d' % n)
+		if n not in results:
+			results[n] = []
+		# Runs finished before resuming, answers are assumed if in time:
+		resumed = collections.defaultdict(list)
+		for cube_index, solver, solver_time in results[n]:
+			resumed[cube_index].append((solver_time, solver, solver_time < op.max_cdcl_time))
+		for cube_index, cube in enumerate(random_cubes):
+			solvers = [solver for solver in op.cdcl_solvers if solver not in stopped_solvers \
+			           and (n, cube_index, solver) not in done_cubes]
+			if cube_index in resumed and (not op.keep_all or len(solvers) == 0):
+				finish({'times' : resumed[cube_index]}, n)
+				continue
+			if len(solvers) == 0:
+				isExit = True
+				break
+			# Break if script time limit is reached:
+			if time.time() - start_time > op.max_script_time:
+				logging.info('Script time limit it reached, stop.')
+				isExit = True
+				break
+			race = {'left' : len(solvers), 'done' : False, 'times' : list(resumed[cube_index])}
+			for solver in solvers:
+				await sched.acquire() # wait until any cpu is free
+				# Skip a run if the cube is already solved or the solver is stopped:
+				if race['done'] or solver in stopped_solvers:
+					sched.release()
+					race['left'] -= 1
+					if race['left'] == 0 and not race['done']:
+						finish(race, n)
+					continue
+				sched.start(solve_cube(cnf_name, n, cube, cube_index, task_index, solver), \
+				            lambda res, r=race: collect(res, r), (n, solver, cube_index))
+				task_index += 1
+		logging.info('results[n] len : %d' % len(results[n]))
+	await sched.join()
+	await stop_coordinator()
+	for n in sorted_random_cubes_n:
+		if (n, VBS_NAME) not in estimates:
+			continue
+		stat = estimates[(n, VBS_NAME)]
+		est, low, high = conquer_estimation(stat, cubes_num_n[n], op.cpu_num)
+		logging.info('portfolio: n %d, VBS on %d cubes, mean %.2f, estimation %.2f days on %d cores in [%.2f, %.2f]' % \
+		             (n, stat.count, stat.mean, est / 86400, op.cpu_num, low / 86400, high / 86400))
+		for solver in op.cdcl_solvers:
+			logging.info('portfolio: n %d, solver %s won on %d cubes' % (n, solver, wins[(n, solver)]))
+
+# Main function:
+if __name__ == '__main__':
+	exit_cubes_creating = False
+
+	if len(sys.argv) < 2:
+		print_usage()
+		exit(1)
+	cnf_name = sys.argv[1]
+
+	op = Options()
+	op.read(sys.argv[2:])
+	print(op)
+
+	random.seed(op.seed)
+
+	# Estimation by conflicts needs solvers which can be limited by conflicts
+	# and report them:
+	if op.max_conflicts > 0:
+		for solver in op.cdcl_solvers:
+			adapter = solver_adapters.get_adapter(solver)
+			if adapter.conflict_limit(op.max_conflicts) == '' or not adapter.reports_conflicts:
+				print('solver ' + solver + ' can not be limited by conflicts or does not report them')
+				exit(1)
+
+	log_name = './log_' + cnf_name.replace('./','').replace('.','')
+	print('log_name : ' + log_name)
+	logging.basicConfig(filename=log_name, filemode = 'w', level=logging.INFO)
+
+	logging.info('cnf : ' + cnf_name)
+	logging.info('total number of CPU cures: %d' % mp.cpu_count())
+	logging.info('used CPU cores : %d' % op.cpu_num)
+	logging.info('Options: \n' + str(op))
+
+	start_time = time.time()
+
+	if op.max_mem > 0:
+		mem_budget = op.max_mem * 2**20
+	else:
+		mem_budget = int(solver_scheduler.available_memory() * MEM_BUDGET_FRACTION)
+	logging.info('memory budget for lookahead runs : %d KB' % mem_budget)
+	march_mem_obs = []
+
+	la_cache = None
+	if op.la_cache != '':
+		la_cache = lookahead_cache.LookaheadCache(op.la_cache, op.la_cache_size * 2**30)
+
+	# Count free variables:
+	free_vars_num = get_free_vars_num(cnf_name)
+	logging.info('unit propagation : ' + str(get_base_prop(cnf_name)))
+	logging.info('free vars : %d' % free_vars_num)
+	n = free_vars_num
+	while n % op.nstep != 0 and n > 0:
+		n -= 1
+	logging.info('start n : %d ' % n)
+
+	# Prepare output files:
+	stat_name = 'stat_' + cnf_name
+	stat_name = stat_name.replace('.','')
+	stat_name = stat_name.replace('/','')
+	checkpoint_name = 'checkpoint_' + cnf_name
+	checkpoint_name = checkpoint_name.replace('.','')
+	checkpoint_name = checkpoint_name.replace('/','')
+	sample_name = 'sample_results_' + cnf_name
+	sample_name = sample_name.replace('.','')
+	sample_name = sample_name.replace('/','')
+	sample_name += '.csv'
+	stopped_solvers = set()
+	results = dict()
+	estimates = dict()
+	conflict_rates = dict() # solver -> [conflicts, CPU time] of its runs
+	resumed_n = dict()
+	resumed_samples = dict()
+	done_cubes = set()
+	if op.resume:
+		read_checkpoint()
+	if not op.resume or not os.path.isfile(stat_name):
+		stat_file = open(stat_name,'w')
+		stat_file.write('n cubes refuted-leaves cubing-time\n')
+		stat_file.close()
+	if not op.resume:
+		open(checkpoint_name, 'w').close()
+
+	random_cubes_n = dict()
+	cubes_num_n = dict()
+	cubes_num_lst = []
+	if op.model_search:
+		asyncio.run(model_cubing_phase(cnf_name, n))
+	else:
+		asyncio.run(cubing_phase(cnf_name, n))
+
+	elapsed_time = time.time() - start_time
+	logging.info('elapsed_time : ' + str(elapsed_time))
+	logging.info('random_cubes_n : ')
+
+	# Prepare file for results:
+	if op.resume and os.path.isfile(sample_name):
+		read_sample_results()
+	else:
+		with open(sample_name, 'w') as sample_file:
+			sample_file.write(SAMPLE_HEADER)
+	# Sort dict by n in descending order:
+	sorted_random_cubes_n = collections.OrderedDict(sorted(random_cubes_n.items()))
+
+	logging.info('sorted_random_cubes_n : ')
+	logging.info(sorted_random_cubes_n)
+	# for evary n solve cube-problems from the random sample:
+	logging.info('')
+	logging.info('processing random samples')
+	logging.info('')
+
+	solvers = op.cdcl_solvers
+
+	cdcl_sched = None
+	coordinator = None
+	est_name = 'est_' + cnf_name
+	est_name = est_name.replace('.','')
+	est_name = est_name.replace('/','')
+	last_est_write_time = time.time()
+	if op.portfolio:
+		asyncio.run(portfolio_sampling_phase(cnf_name, sorted_random_cubes_n))
+	elif op.race:
+		asyncio.run(racing_sampling_phase(cnf_name, sorted_random_cubes_n))
+	else:
+		asyncio.run(sampling_phase(cnf_name, sorted_random_cubes_n))
 
-	# Write results:
-	for n, res in results.items():
-		with open(sample_name, 'a') as sample_file:
-			for r in res:
-				sample_file.write('%d %d %s %.2f\n' % (n, r[0], r[1], r[2])) # tuple (cube_index,solver,solver_time)
+	if len(estimates) > 0:
+		write_estimates()
+	if op.max_conflicts > 0:
+		for solver in op.cdcl_solvers:
+			logging.info('solver %s : %.1f conflicts per second' % (solver, conflict_rate(solver)))
 
 	# Remove tmp files from solver's script:
 	remove_file('./*.mincnf')
@@ -0,0 +1,143 @@
+# Created on: 17 Oct 2026
+# Author: Oleg Zaikin
+# E-mail: zaikin.icc@gmail.com
+#
+# CNF which is held in memory and simplified by unit propagation. Cubes are
+# assigned to it, then satisfied clauses and falsified literals are removed.
+# The simplified CNF is written with its variables renumbered to 1..k, so
+# lookahead and CDCL solvers are run on smaller CNFs. Literals of the original
+# CNF are used everywhere except written CNFs, whose literals are mapped back
+# by to_orig().
+#
+# A back-map file <cnf>.map is written along with a CNF. Its lines are
+# '<variable> <original variable>', and then '0 <original literal>' for each
+# literal fixed by unit propagation, so a model of the written CNF can be
+# turned into a model of the original one.
+#
+# Example:
+#   f = formula.Formula.read('problem.cnf')
+#   if f.assign([-12, 345]):
+#       f.write('problem_simp.cnf')
+#       cube = f.to_orig([3, -5]) # literals of problem_simp.cnf
+#==============================================================================
+
+import collections
+import dimacs
+
+version = '0.0.1'
+
+# Number of clauses which are converted to bytes at once:
+WRITE_BATCH = 1 << 16
+
+class Formula:
+    # clauses - tuples of int literals, they are shared by copies and never
+    # changed; fixed - variable -> its fixed literal:
+    def __init__(self, clauses : list, vars_num : int, fixed=None):
+        self.clauses = clauses
+        self.vars_num = vars_num
+        self.fixed = dict() if fixed is None else dict(fixed)
+        # Variable of the last written CNF -> original variable, the identity
+        # until a CNF is written:
+        self.back_map = None
+        self.conflict = False
+    # Variables are counted in the last written CNF:
+    def __str__(self):
+        vars_num = self.vars_num if self.back_map is None else len(self.back_map) - 1
+        return 'vars : ' + str(vars_num) + ', clauses : ' + str(len(self.clauses)) + \
+               ', fixed : ' + str(len(self.fixed)) + (', conflict' if self.conflict else '')
+    @staticmethod
+    def read(cnf_name : str):
+        cnf = dimacs.read_cnf(cnf_name)
+        clauses = []
+        vars_num = cnf.vars_num
+        for clause in dimacs.iter_clauses(cnf):
+            for lit in clause:
+                vars_num = vars_num if vars_num >= abs(lit) else abs(lit)
+            clauses.append(tuple(clause))
+        cnf.close()
+        return Formula(clauses, vars_num)
+    def copy(self):
+        f = Formula(self.clauses, self.vars_num, self.fixed)
+        f.back_map = self.back_map
+        f.conflict = self.conflict
+        return f
+    # Original literals of literals of the last written CNF:
+    def to_orig(self, lits : list):
+        if self.back_map is None:
+            return [int(lit) for lit in lits]
+        res = []
+        for lit in lits:
+            lit = int(lit)
+            v = self.back_map[abs(lit)]
+            res.append(v if lit > 0 else -v)
+        return res
+    # Assign original literals and propagate them together with unit clauses.
+    # False is returned if a conflict is found:
+    def assign(self, lits : list):
+        if self.conflict:
+            return False
+        fixed = self.fixed
+        clauses = self.clauses
+        occurs = collections.defaultdict(list)
+        queue = list(lits)
+        for i, clause in enumerate(clauses):
+            if len(clause) == 1:
+                queue.append(clause[0])
+            for lit in clause:
+                occurs[lit].append(i)
+        head = 0
+        while head < len(queue):
+            lit = queue[head]
+            head += 1
+            v = abs(lit)
+            if v in fixed:
+                if fixed[v] != lit:
+                    self.conflict = True
+                    return False
+                continue
+            fixed[v] = lit
+            # Only clauses with the falsified literal can become unit:
+            for i in occurs.get(-lit, []):
+                unassigned = 0
+                last = 0
+                for l in clauses[i]:
+                    val = fixed.get(abs(l))
+                    if val is None:
+                        unassigned += 1
+                        last = l
+                        if unassigned > 1:
+                            break
+                    elif val == l:
+                        unassigned = -1
+                        break
+                if unassigned == 0:
+                    self.conflict = True
+                    return False
+                if unassigned == 1:
+                    queue.append(last)
+        # Remove satisfied clauses and falsified literals:
+        simplified = []
+        for clause in clauses:
+            if not any([abs(l) in fixed for l in clause]):
+                simplified.append(clause)
+            elif not any([fixed.get(abs(l)) == l for l in clause]):
+                simplified.append(tuple([l for l in clause if abs(l) not in fixed]))
+        self.clauses = simplified
+        return True
+    # Write the CNF with renumbered variables and its back-map:
+    def write(self, cnf_name : str):
+        assert(not self.conflict)
+        used = sorted(set([abs(l) for clause in self.clauses for l in clause]))
+        new_var = dict([(v, i+1) for i, v in enumerate(used)])
+        with open(cnf_name, 'wb') as ofile:
+            ofile.write(b'p cnf %d %d\n' % (len(used), len(self.clauses)))
+            for i in range(0, len(self.clauses), WRITE_BATCH):
+                batch = self.clauses[i:i+WRITE_BATCH]
+                ofile.write(dimacs.clauses_bytes([[new_var[l] if l > 0 else -new_var[-l] for l in clause] \
+                                                  for clause in batch]))
+        with open(cnf_name + '.map', 'w') as ofile:
+            for i, v in enumerate(used):
+                ofile.write('%d %d\n' % (i+1, v))
+            for v in sorted(self.fixed):
+                ofile.write('0 %d\n' % self.fixed[v])
+        self.back_map = [0] + used
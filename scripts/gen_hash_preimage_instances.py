@@ -9,12 +9,20 @@
 # Example:
 #   python3 ./gen_hash_preimage_instances.py ./template.cnf ./hashes 128
 # for each hash from the file hashes, a CNF will be generated.
+#
+# The main CNF's clauses are read into memory once, and each CNF is written
+# as a header, a copy of the clauses, and unit clauses of its hash. With
+# --cpunum=<int>, CNFs are written by several processes. With --inccnf, a
+# single CNF in the incremental format (p inccnf) is written instead, where
+# each hash is a cube, in the order of the hash file.
 #==============================================================================
 
 import sys
+import multiprocessing as mp
+import dimacs
 
 script_name = "gen_hash_preimage_instances.py"
-version = "0.1.0"
+version = "0.2.0"
 
 if len(sys.argv) == 2 and sys.argv[1] == '-v':
     print('Script ' + script_name + ' of version : ' + version)
@@ -22,9 +30,12 @@ if len(sys.argv) == 2 and sys.argv[1] == '-v':
 
 if len(sys.argv) < 5 or (len(sys.argv) == 2 and sys.argv[1] == '-h'):
     print('Usage: ' + script_name + ' cnf-name hash-file hash-length inst-num [--hashvars=fname] [--random]')
+    print('         [--cpunum=<int>] [--inccnf]')
     print('  --hashvars : file name with hash variables in the format from-to')
     print('    optional since e.g. in Transalg the output variables are the last ones.')
     print('  --random : 0hash and 1hash are marked, the remaining are randhashes')
+    print('  --cpunum : number of processes which write CNFs, 1 by default')
+    print('  --inccnf : write one CNF in the incremental format with a cube per hash')
     print('  NB. CNFs made by CBMC must be modifed by add_explicit_output_vars_cbmc.py beforehand.')
     exit(1)
 
@@ -38,14 +49,22 @@ print('hash_len : ' + str(hash_len))
 print('instances_num : ' + str(instances_num))
 is_random_hashes = False
 hash_vars_file_name = ''
+cpu_num = 1
+is_inccnf = False
 for i in range(5, len(sys.argv)):
     if sys.argv[i] == '--random':
         is_random_hashes = True
+    elif sys.argv[i] == '--inccnf':
+        is_inccnf = True
+    elif '--cpunum=' in sys.argv[i]:
+        cpu_num = int(sys.argv[i].split('--cpunum=')[1])
+        print('cpu_num : ' + str(cpu_num))
     elif '--hashvars=' in sys.argv[i]:
         hash_vars_file_name = sys.argv[i].split('--hashvars=')[1]
         print('hash_vars_file_name : ' + hash_vars_file_name)
 
 hashes = []
+hashes_set = set()
 with open(hash_file, 'r') as f:
       lines = f.read().splitlines()
       for line in lines:
@@ -53,8 +72,9 @@ with open(hash_file, 'r') as f:
                   continue
             assert(len(line) >= hash_len)
             hash = line[:hash_len]
-            assert(hash not in hashes)
+            assert(hash not in hashes_set)
             hashes.append(hash)
+            hashes_set.add(hash)
 
 print(str(len(hashes)) + ' hashes were read :')
 for h in hashes:
@@ -62,27 +82,14 @@ for h in hashes:
 
 assert(instances_num <= len(hashes))
 
-vars_num = 0
-clauses_num = 0
-
-main_clauses = []
-with open(cnf_name, 'r') as cnf_file:
-		lines = cnf_file.read().splitlines()
-		for line in lines:
-			if len(line) < 2 or line[0] == 'c':
-				  continue
-			elif line[0] == 'p':
-				  words = line.split()
-				  assert(len(words) == 4)
-				  vars_num = int(words[2])
-				  clauses_num = int(words[3])
-			else:
-				  main_clauses.append(line)
-
-assert(clauses_num == len(main_clauses))
+main_cnf = dimacs.read_cnf(cnf_name)
+vars_num = main_cnf.vars_num
+clauses_num = main_cnf.clauses_num
+
+assert(clauses_num == main_cnf.clause_lines)
 print('vars_num : ' + str(vars_num))
 print('clauses_num : ' + str(clauses_num))
-print('main_clauses size : ' + str(len(main_clauses)))
+print('main_clauses size : ' + str(main_cnf.clause_lines))
 
 cnf_name_without_ext = cnf_name.split('.cnf')[0]
 
@@ -105,41 +112,61 @@ assert(len(hash_vars) > 0)
 print('hash_vars :')
 print(hash_vars)
 
-hash_index = 0
-assert(instances_num > 0)
-for i in range(instances_num):
-    assert(hash_index >= 0)
+# Literals of hash variables which encode a hash:
+def hash_literals(hash : str):
     k = 0
     literals = []
     #for var in range(vars_num - hash_len + 1, vars_num+1):
     for var in hash_vars:
         lit = ''
         if var >= 0:
-            lit = '-' if hashes[i][k] == '0' else ''
+            lit = '-' if hash[k] == '0' else ''
         else: # CBMC for some reason sometimes produces negative variables
-            lit = '-' if hashes[i][k] == '1' else ''
+            lit = '-' if hash[k] == '1' else ''
         lit += str(abs(var))
         literals.append(lit)
         k += 1
-        if k >= len(hashes[i]):
+        if k >= len(hash):
             break
     assert(len(literals) == hash_len)
+    return literals
+
+# Name of a CNF for the hash with a given index:
+def instance_name(hash_index : int):
     if is_random_hashes:
         if hash_index == 0:
              tmp = '0hash'
         elif hash_index == 1:
              tmp = '1hash'
         else:
-             tmp = 'randhash' + str(i-2)
-        cnf_name = cnf_name_without_ext + '_hashlen' + str(hash_len) + '_' + tmp + '.cnf'
-    else:
-        cnf_name = cnf_name_without_ext + '_hashlen' + str(hash_len) + '_inst' + str(hash_index) + '.cnf'
-    with open(cnf_name, 'w') as ofile:
-        ofile.write('p cnf ' + str(vars_num) + ' ' + str(clauses_num + len(literals)) + '\n')
-        for clause in main_clauses:
-            ofile.write(clause + '\n')
-        for lit in literals:
-            ofile.write(lit + ' 0\n')
-    hash_index += 1
+             tmp = 'randhash' + str(hash_index-2)
+        return cnf_name_without_ext + '_hashlen' + str(hash_len) + '_' + tmp + '.cnf'
+    return cnf_name_without_ext + '_hashlen' + str(hash_len) + '_inst' + str(hash_index) + '.cnf'
+
+# Write the main CNF with unit clauses of a hash, it is run by processes:
+def write_instance(hash_index : int):
+    with open(instance_name(hash_index), 'wb') as ofile:
+        dimacs.write_cnf(ofile, main_cnf, [[lit] for lit in hash_literals(hashes[hash_index])])
+
+assert(instances_num > 0)
+# Clauses are copied to every CNF, so they are read only once (before
+# processes are forked, so they are shared):
+main_cnf.clause_block()
+if is_inccnf:
+    icnf_name = cnf_name_without_ext + '_hashlen' + str(hash_len) + '.icnf'
+    with open(icnf_name, 'wb') as ofile:
+        ofile.write(b'p inccnf\n')
+        ofile.write(main_cnf.clause_block())
+        for i in range(instances_num):
+            ofile.write(('a ' + ' '.join(hash_literals(hashes[i])) + ' 0\n').encode())
+    print(str(instances_num) + ' cubes were written to ' + icnf_name)
+    exit(0)
+if cpu_num > 1:
+    # Functions and the main CNF are inherited by forked processes:
+    with mp.get_context('fork').Pool(cpu_num) as pool:
+        pool.map(write_instance, range(instances_num))
+else:
+    for i in range(instances_num):
+        write_instance(i)
 
 print(str(instances_num) + ' instances were generated')
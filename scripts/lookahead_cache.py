@@ -0,0 +1,147 @@
+# Created on: 17 Oct 2026
+# Author: Oleg Zaikin
+# E-mail: zaikin.icc@gmail.com
+#
+# Content-addressed cache of lookahead (cubing) runs. An entry is keyed by
+# a fingerprint of the CNF's content, the cutoff threshold n, and a
+# fingerprint of the lookahead solver's binary, and the format of the cube
+# file (text or binary, see cube_file.py), so renamed or copied CNFs are hits
+# while modified CNFs, rebuilt solvers, or other formats are misses. An entry keeps
+# the cube file, the number of cubes, the number of refuted leaves, and the
+# cubing time. Least recently used entries are evicted once the cache is
+# larger than a given size.
+#
+# Example:
+#   cache = lookahead_cache.LookaheadCache('~/.cache/la', 10 * 2**30)
+#   info = cache.get('a.cnf', 100, 'march_cu', 'cubes_n_100')  # fmt='bin' for binary cubes
+#   if info is None:
+#       ... run march_cu ...
+#       cache.put('a.cnf', 100, 'march_cu', 'cubes_n_100', cubes_num, \
+#                 refuted_leaves, cubing_time)
+#==============================================================================
+
+import os
+import shutil
+import hashlib
+import logging
+
+version = '0.0.3'
+
+# Size of blocks in which files are hashed:
+HASH_BLOCK_SIZE = 1 << 22
+CUBES_FILE = 'cubes'
+INFO_FILE = 'info'
+
+# Parse lookahead solver's log, -1 is returned if the run is not finished:
+def parse_cubing_log(o : str):
+    cubes = -1
+    refuted_leaves = -1
+    for line in o.split('\n'):
+        if 'c number of cubes' in line:
+            cubes = int(line.split('c number of cubes ')[1].split(',')[0])
+            refuted_leaves = int(line.split(' refuted leaves')[0].split(' ')[-1])
+    return cubes, refuted_leaves
+
+# Fingerprints of files are computed once while files are not changed:
+_fingerprints = dict()
+
+# SHA-256 of a file's content:
+def file_fingerprint(file_name : str):
+    st = os.stat(file_name)
+    stamp = (os.path.realpath(file_name), st.st_size, st.st_mtime_ns)
+    if stamp not in _fingerprints:
+        h = hashlib.sha256()
+        with open(file_name, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                h.update(block)
+        _fingerprints[stamp] = h.hexdigest()
+    return _fingerprints[stamp]
+
+# Fingerprint of a solver given by a name in PATH or by a path:
+def solver_fingerprint(solver : str):
+    path = shutil.which(solver)
+    if path is None:
+        return solver
+    return file_fingerprint(path)
+
+# Link a file, or copy it if a link is impossible (e.g. other file system):
+def link_or_copy(src : str, dst : str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+class LookaheadCache:
+    def __init__(self, cache_dir : str, max_size : int):
+        self.dir = os.path.expanduser(cache_dir)
+        self.max_size = max_size
+        os.makedirs(self.dir, exist_ok=True)
+    def key(self, cnf_name : str, n : int, solver : str, fmt : str):
+        s = file_fingerprint(cnf_name) + ' ' + str(n) + ' ' + solver_fingerprint(solver)
+        # Keys of text cube files are the same as before formats were added:
+        if fmt != 'text':
+            s += ' ' + fmt
+        return hashlib.sha256(s.encode()).hexdigest()
+    # If a run is cached, place its cubes to cubes_name and return
+    # (cubes_num, refuted_leaves, cubing_time), otherwise return None.
+    # If time_limit > 0, a run which took longer is a miss, since it would
+    # be interrupted by the limit:
+    def get(self, cnf_name : str, n : int, solver : str, cubes_name : str, fmt='text', time_limit=0):
+        entry = os.path.join(self.dir, self.key(cnf_name, n, solver, fmt))
+        info_name = os.path.join(entry, INFO_FILE)
+        try:
+            with open(info_name, 'r') as f:
+                words = f.read().split()
+            if time_limit > 0 and float(words[2]) > time_limit:
+                logging.info('lookahead cache : n %d, %s took longer than %d seconds' % \
+                             (n, cnf_name, time_limit))
+                return None
+            if os.path.exists(cubes_name):
+                os.remove(cubes_name)
+            link_or_copy(os.path.join(entry, CUBES_FILE), cubes_name)
+        except FileNotFoundError: # a miss or an evicted entry
+            return None
+        # The modification time of info is the last usage time:
+        os.utime(info_name)
+        logging.info('lookahead cache hit : n %d, %s' % (n, cnf_name))
+        return int(words[0]), int(words[1]), float(words[2])
+    # Cache a finished run, cubes_name is not changed:
+    def put(self, cnf_name : str, n : int, solver : str, cubes_name : str, \
+            cubes_num : int, refuted_leaves : int, cubing_time : float, fmt='text'):
+        key = self.key(cnf_name, n, solver, fmt)
+        entry = os.path.join(self.dir, key)
+        if os.path.isdir(entry):
+            return
+        # Fill a temporary directory and rename it at once:
+        part = os.path.join(self.dir, key + '.part' + str(os.getpid()))
+        shutil.rmtree(part, ignore_errors=True)
+        os.makedirs(part)
+        link_or_copy(cubes_name, os.path.join(part, CUBES_FILE))
+        with open(os.path.join(part, INFO_FILE), 'w') as f:
+            f.write('%d %d %.2f\n' % (cubes_num, refuted_leaves, cubing_time))
+        try:
+            os.rename(part, entry)
+        except OSError: # cached by another process
+            shutil.rmtree(part, ignore_errors=True)
+        self.evict()
+    # Remove least recently used entries until the cache fits its size:
+    def evict(self):
+        entries = []
+        total_size = 0
+        for key in os.listdir(self.dir):
+            if '.part' in key:
+                continue
+            entry = os.path.join(self.dir, key)
+            try:
+                size = os.path.getsize(os.path.join(entry, CUBES_FILE))
+                last_used = os.path.getmtime(os.path.join(entry, INFO_FILE))
+            except OSError: # being added or removed
+                continue
+            entries.append((last_used, size, entry))
+            total_size += size
+        for last_used, size, entry in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+            logging.info('lookahead cache eviction : ' + entry)
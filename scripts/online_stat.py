@@ -0,0 +1,43 @@
+# Created on: 17 Oct 2026
+# Author: Oleg Zaikin
+# E-mail: zaikin.icc@gmail.com
+#
+# Online mean and variance of a stream of values by Welford's method, and
+# confidence intervals on the mean.
+#==============================================================================
+
+import math
+
+version = '0.0.1'
+
+# Two-sided 95% confidence by the normal approximation:
+Z_95 = 1.96
+
+class OnlineStat:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0     # sum of squared deviations from the mean
+        self.min = math.inf
+        self.max = -math.inf
+    def __str__(self):
+        return 'count : %d, mean : %.4f, sd : %.4f' % (self.count, self.mean, self.sd())
+    def add(self, x : float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+    # Unbiased sample variance:
+    def var(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+    def sd(self):
+        return math.sqrt(self.var())
+    # Half-width of the confidence interval on the mean:
+    def half_width(self, z=Z_95):
+        return z * self.sd() / math.sqrt(self.count) if self.count > 0 else math.inf
+    # Confidence interval on the mean:
+    def ci(self, z=Z_95):
+        h = self.half_width(z)
+        return self.mean - h, self.mean + h
@@ -14,11 +14,12 @@
 #
 #==============================================================================
 
-version = '0.0.2'
+version = '0.0.3'
 
 script_name = 'partial_hash.py'
 
 import sys
+import dimacs
 
 if len(sys.argv) < 4:
   print('Usage: ' + script_name + ' CNF hashsize knownbits')
@@ -40,34 +41,19 @@ else:
 print(known_bits)
 print('Generating ' + str(len(known_bits)) + ' CNFs')
 
-all_clauses = []
-main_clauses = []
-hash_clauses = []
-varnum = 0
-with open(cnf_name) as ifile:
-  lines = ifile.read().splitlines()
-  for line in lines:
-    if line[0] == 'c' or line[0] == 'p':
-      continue
-    literals = line.split(' ')[:-1] # exclude 0 at the end
-    for lit in literals:
-      varnum = varnum if varnum >= abs(int(lit)) else abs(int(lit))
-    all_clauses.append(line)
-print(str(len(all_clauses)) + ' clauses were read')
-main_clauses = all_clauses[0:-hashsize]
-hash_clauses = all_clauses[-hashsize:]
+cnf = dimacs.read_cnf(cnf_name)
+varnum = dimacs.max_var(cnf)
+print(str(cnf.clause_lines) + ' clauses were read')
+main_cnf, hash_cnf = dimacs.split_clauses(cnf, cnf.clause_lines - hashsize)
+hash_clauses = list(dimacs.iter_clauses(hash_cnf))
 print(str(len(hash_clauses)) + ' oneliteral hash-clauses : ')
 for cla in hash_clauses:
-  print(cla)
+  print(' '.join([str(lit) for lit in cla]) + ' 0')
 
 for k in known_bits:
   new_cnf_name = cnf_name.split('.cnf')[0] + '_' + str(k) + 'bithash.cnf'
   print(new_cnf_name)
-  clanum = len(main_clauses) + k
-  with open(new_cnf_name, 'w+') as ofile:
-    ofile.write('p cnf ' + str(varnum) + ' ' + str(clanum) + '\n')
-    for s in main_clauses:
-      ofile.write(s + '\n')
-    for s in hash_clauses[:k]:
-      assert(len(s.split()) == 2 and s.split()[-1] == '0')
-      ofile.write(s + '\n')
+  for cla in hash_clauses[:k]:
+    assert(len(cla) == 1)
+  with open(new_cnf_name, 'wb') as ofile:
+    dimacs.write_cnf(ofile, main_cnf, hash_clauses[:k], varnum)
@@ -0,0 +1,309 @@
+# Created on: 17 Oct 2026
+# Author: Oleg Zaikin
+# E-mail: zaikin.icc@gmail.com
+#
+# Distributed sampling for find_cnc_threshold.py over plain TCP.
+# The coordinator is find_cnc_threshold.py run with -port=<int>. During the
+# sampling phase it accepts workers, and each worker's CPU cores become extra
+# slots of the scheduler. A worker pulls tasks (n, cube, solver), solves them
+# by process_cube_solver() of find_cnc_threshold.py, and pushes results back.
+# A worker gets the CNF from the coordinator once, and it is cached by its
+# fingerprint. If a worker disconnects, its tasks are solved elsewhere.
+#
+# Messages are JSON objects, one per line. The CNF follows a 'cnf' message
+# as raw bytes. Workers run commands they are given, so the coordinator
+# listens on 127.0.0.1 by default, and a worker is accepted only if its
+# 'hello' has the coordinator's token. The token is sent in plain text, so
+# use it in a trusted network. A worker removes its files of a task once
+# the result is sent.
+#
+# Example (a worker with 32 cores, it waits for the coordinator):
+#   python3 ./sampling_net.py coordinator-host:5555 -cpunum=32 -token=<str>
+# Several local workers can be run on one machine for testing.
+#==============================================================================
+
+import sys
+import os
+import json
+import hmac
+import secrets
+import socket
+import signal
+import asyncio
+import logging
+import collections
+import multiprocessing as mp
+import dimacs
+import lookahead_cache
+import solver_scheduler
+import solver_adapters
+
+version = '0.0.4'
+script_name = 'sampling_net.py'
+
+# Seconds between a worker's attempts to connect to the coordinator:
+RETRY_PERIOD = 5
+# Size of blocks in which the CNF is sent:
+SEND_BLOCK_SIZE = 1 << 20
+# Address on which the coordinator listens by default:
+DEFAULT_HOST = '127.0.0.1'
+
+# Random token for workers:
+def new_token():
+    return secrets.token_hex(16)
+
+def send(writer, msg : dict):
+    writer.write((json.dumps(msg) + '\n').encode())
+
+# Receive a message, None if the connection is closed:
+async def recv(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+# A connected worker:
+class Remote:
+    def __init__(self, writer, cpu_num : int, name : str):
+        self.writer = writer
+        self.cpu_num = cpu_num
+        self.name = name
+        self.closed = False
+        self.pending = dict() # task id -> future of result
+
+class Coordinator:
+    # sched - scheduler of the sampling phase, it gets slots of workers;
+    # argv - options of find_cnc_threshold.py which are given to workers;
+    # local_solve - process_cube_solver() of find_cnc_threshold.py;
+    # token - workers without it are rejected.
+    def __init__(self, sched, cnf_name : str, argv : list, local_solve, token : str):
+        self.sched = sched
+        self.token = token
+        self.cnf_name = cnf_name
+        self.argv = argv
+        self.local_solve = local_solve
+        self.local_free = sched.cpu_num
+        self.idle = collections.deque() # a worker per its free core
+        self.changed = asyncio.Event()
+        self.remotes = set()
+        self.handlers = set() # tasks serving connections
+        self.server = None
+        self.task_id = 0
+    async def start(self, host : str, port : int):
+        self.fingerprint = lookahead_cache.file_fingerprint(self.cnf_name)
+        self.server = await asyncio.start_server(self.handle, host, port)
+        logging.info('coordinator : listening on %s:%d' % (host, port))
+    # Tell workers that sampling is finished:
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        for remote in self.remotes:
+            send(remote.writer, {'type' : 'done'})
+            remote.writer.close()
+        for task in self.handlers:
+            task.cancel()
+        if len(self.handlers) > 0:
+            await asyncio.wait(set(self.handlers))
+        if self.server is not None:
+            await self.server.wait_closed()
+    async def handle(self, reader, writer):
+        remote = None
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        try:
+            hello = await recv(reader)
+            if hello is None or hello['type'] != 'hello':
+                return
+            if not hmac.compare_digest(str(hello.get('token', '')).encode(), self.token.encode()):
+                logging.error('coordinator : worker %s is rejected, wrong token' % \
+                              str(writer.get_extra_info('peername')))
+                return
+            send(writer, {'type' : 'setup', 'fingerprint' : self.fingerprint, 'argv' : self.argv})
+            msg = await recv(reader)
+            if msg is not None and msg['type'] == 'need_cnf':
+                send(writer, {'type' : 'cnf', 'size' : os.path.getsize(self.cnf_name)})
+                with open(self.cnf_name, 'rb') as f:
+                    for block in iter(lambda: f.read(SEND_BLOCK_SIZE), b''):
+                        writer.write(block)
+                        await writer.drain()
+                msg = await recv(reader)
+            if msg is None or msg['type'] != 'ready':
+                return
+            remote = Remote(writer, hello['cpus'], hello['name'])
+            self.remotes.add(remote)
+            for i in range(remote.cpu_num):
+                self.idle.append(remote)
+            self.sched.add_slots(remote.cpu_num)
+            self.changed.set()
+            logging.info('coordinator : worker %s with %d cores is connected' % (remote.name, remote.cpu_num))
+            while True:
+                msg = await recv(reader)
+                if msg is None:
+                    break
+                if msg['type'] == 'result' and msg['id'] in remote.pending:
+                    remote.pending.pop(msg['id']).set_result(msg)
+        except (ConnectionError, json.JSONDecodeError, KeyError) as e:
+            logging.error('coordinator : ' + repr(e))
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.handlers.discard(task)
+            writer.close()
+            if remote is not None:
+                remote.closed = True
+                self.remotes.discard(remote)
+                self.sched.remove_slots(remote.cpu_num)
+                for fut in remote.pending.values():
+                    if not fut.done():
+                        fut.set_exception(ConnectionError('worker ' + remote.name + ' is disconnected'))
+                logging.info('coordinator : worker %s is disconnected' % remote.name)
+    # Take a free local core (None is returned) or a free core of a worker:
+    async def take_slot(self):
+        while True:
+            if self.local_free > 0:
+                self.local_free -= 1
+                return None
+            while len(self.idle) > 0:
+                remote = self.idle.popleft()
+                if not remote.closed:
+                    return remote
+            self.changed.clear()
+            await self.changed.wait()
+    def give_slot(self, remote):
+        if remote is None:
+            self.local_free += 1
+        elif not remote.closed:
+            self.idle.append(remote)
+        self.changed.set()
+    # Solve a CNF with a cube on a free core, the result is the same as the
+    # one of process_cube_solver():
+    async def solve(self, cnf_name : str, n : int, cube : list, cube_index : int, task_index : int, solver : str):
+        while True:
+            remote = await self.take_slot()
+            try:
+                if remote is None:
+                    return await self.local_solve(cnf_name, n, cube, cube_index, task_index, solver)
+                return await self.solve_remote(remote, cnf_name, n, cube, cube_index, task_index, solver)
+            except ConnectionError as e:
+                logging.info('coordinator : ' + str(e) + ', task is restarted')
+            finally:
+                self.give_slot(remote)
+    async def solve_remote(self, remote, cnf_name : str, n : int, cube : list, cube_index : int, task_index : int, solver : str):
+        self.task_id += 1
+        task_id = self.task_id
+        fut = asyncio.get_running_loop().create_future()
+        remote.pending[task_id] = fut
+        send(remote.writer, {'type' : 'task', 'id' : task_id, 'n' : n, 'cube' : cube, \
+                             'cube_index' : cube_index, 'task_index' : task_index, 'solver' : solver})
+        try:
+            msg = await fut
+        except asyncio.CancelledError:
+            remote.pending.pop(task_id, None)
+            if not remote.closed:
+                send(remote.writer, {'type' : 'cancel', 'id' : task_id})
+            raise
+        run_stat = solver_scheduler.RunStat()
+        run_stat.wall_time = msg['wall']
+        run_stat.user_time = msg['user']
+        run_stat.sys_time = msg['sys']
+        run_stat.max_rss = msg['rss']
+        known_cube_cnf_name = './sample_cnf_n_' + str(n) + '_cube_' + str(cube_index) + '_task_' + str(task_index) + '.cnf'
+        solver_log = solver_adapters.SolverLog(dict(), known_cube_cnf_name + '.model')
+        solver_log.answer = msg['answer']
+        for name in solver_adapters.STATS:
+            setattr(solver_log, name, msg[name])
+        is_sat = solver_log.answer == solver_adapters.SAT
+        if is_sat:
+            # Keep the satisfiable CNF and the model as a local run does:
+            await asyncio.to_thread(dimacs.add_cube, cnf_name, known_cube_cnf_name, cube)
+            with open(solver_log.model_name, 'w') as f:
+                f.write(msg['model'])
+            logging.info('coordinator : SAT on worker ' + remote.name)
+        return cnf_name, n, cube_index, solver, msg['wall'], is_sat, solver_log, known_cube_cnf_name, \
+               run_stat, solver_log.is_answered()
+
+# Worker: solve tasks of a coordinator until sampling is finished:
+async def run_worker(host : str, port : int, cpu_num : int, token : str):
+    import find_cnc_threshold as fct
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port, limit=1 << 24)
+            break
+        except OSError:
+            await asyncio.sleep(RETRY_PERIOD)
+    name = socket.gethostname() + ':' + str(os.getpid())
+    send(writer, {'type' : 'hello', 'cpus' : cpu_num, 'name' : name, 'token' : token})
+    setup = await recv(reader)
+    if setup is None:
+        print('worker ' + name + ' : rejected by ' + host + ':' + str(port) + ', check -token')
+        writer.close()
+        return
+    cnf_name = './worker_' + setup['fingerprint'][:16] + '.cnf'
+    if not os.path.isfile(cnf_name):
+        send(writer, {'type' : 'need_cnf'})
+        msg = await recv(reader)
+        part_name = cnf_name + '.part' + str(os.getpid())
+        with open(part_name, 'wb') as f:
+            f.write(await reader.readexactly(msg['size']))
+        os.replace(part_name, cnf_name)
+    send(writer, {'type' : 'ready'})
+    print('worker ' + name + ' : connected to ' + host + ':' + str(port) + ', CNF ' + cnf_name)
+    fct.op = fct.Options()
+    fct.op.read(setup['argv'])
+    fct.op.cpu_num = cpu_num
+    sched = solver_scheduler.Scheduler(cpu_num)
+    def reply(task_id, res):
+        run_stat = res[8]
+        solver_log = res[6]
+        # Only a model is sent, the rest of the log is parsed here:
+        model = ''
+        if res[5] and os.path.isfile(solver_log.model_name):
+            with open(solver_log.model_name, 'r') as f:
+                model = f.read()
+        send(writer, {'type' : 'result', 'id' : task_id, 'wall' : res[4], 'answer' : solver_log.answer, \
+                      'conflicts' : solver_log.conflicts, 'decisions' : solver_log.decisions, \
+                      'propagations' : solver_log.propagations, 'model' : model, \
+                      'user' : run_stat.user_time, 'sys' : run_stat.sys_time, 'rss' : run_stat.max_rss})
+        # The coordinator keeps the satisfiable CNF and the model itself:
+        fct.remove_file(res[7])
+        fct.remove_file(solver_log.model_name)
+    # Stop solvers' runs if the worker is terminated:
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+    for sig in [signal.SIGTERM, signal.SIGINT]:
+        loop.add_signal_handler(sig, main_task.cancel)
+    tasks_num = 0
+    try:
+        while True:
+            msg = await recv(reader)
+            if msg is None or msg['type'] == 'done':
+                break
+            if msg['type'] == 'task':
+                await sched.submit(fct.process_cube_solver(cnf_name, msg['n'], msg['cube'], msg['cube_index'], \
+                                   msg['task_index'], msg['solver']), \
+                                   lambda res, task_id=msg['id']: reply(task_id, res), msg['id'])
+                tasks_num += 1
+            elif msg['type'] == 'cancel':
+                for task in sched.tagged(lambda tag: tag == msg['id']):
+                    task.cancel()
+    except asyncio.CancelledError:
+        print('worker ' + name + ' : terminated')
+    finally:
+        await sched.cancel()
+        writer.close()
+    print('worker ' + name + ' : %d tasks are processed' % tasks_num)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or ':' not in sys.argv[1]:
+        print('Usage: ' + script_name + ' host:port [-cpunum=<int>] [-token=<str>]')
+        exit(1)
+    host, port = sys.argv[1].rsplit(':', 1)
+    cpu_num = mp.cpu_count()
+    token = ''
+    for p in sys.argv[2:]:
+        if '-cpunum=' in p:
+            cpu_num = int(p.split('-cpunum=')[1])
+        if '-token=' in p:
+            token = p.split('-token=')[1]
+    logging.basicConfig(filename='./log_worker_' + str(os.getpid()), filemode='w', level=logging.INFO)
+    asyncio.run(run_worker(host, int(port), cpu_num, token))
@@ -0,0 +1,177 @@
+# Created on: 17 Oct 2026
+# Author: Oleg Zaikin
+# E-mail: zaikin.icc@gmail.com
+#
+# Adapters of CDCL solvers: how a solver is called and how its log is parsed.
+# A log is parsed as a stream of lines by SolverLog, so it is never kept in
+# memory: the answer ('s' line), the numbers of conflicts, decisions, and
+# propagations are extracted, while the model ('v' lines) is written to a
+# file. Once everything is found, the remaining lines are skipped. kissat,
+# CaDiCaL, and clasp print statistics after the answer, so for them parsing
+# is stopped after the statistics.
+#
+# Adapters:
+#   kissat, cadical : 'c conflicts: <int> ...' and so on;
+#   clasp           : parameters are taken from the name clasp-<config>-<enum>,
+#                     statistics are 'c Conflicts : <int>' and 'c Choices : <int>'
+#                     (printed with --stats);
+#   *.sh            : a script which is given a CNF file and a time limit,
+#                     it limits itself, only its answer and model are parsed.
+#
+# Example:
+#   adapter = solver_adapters.get_adapter('kissat')
+#   log = adapter.solver_log('model.txt')
+#   await solver_scheduler.run_cmd_stat(adapter.command('a.cnf'), parser=log)
+#   print(log.answer, log.conflicts)
+#==============================================================================
+
+import os
+
+version = '0.0.3'
+
+SAT = 'SAT'
+UNSAT = 'UNSAT'
+UNKNOWN = 'UNKNOWN'
+
+STATS = ['conflicts', 'decisions', 'propagations']
+
+# Parsed log of a solver's run. Statistics which are not found are -1:
+class SolverLog:
+    # stat_keys maps first words of statistics lines (without 'c ') to names
+    # from STATS, model_name is a file for the model, '' - do not keep it:
+    def __init__(self, stat_keys : dict, model_name=''):
+        self.stat_keys = stat_keys
+        self.model_name = model_name
+        self.answer = UNKNOWN
+        self.conflicts = -1
+        self.decisions = -1
+        self.propagations = -1
+        self.model_file = None
+        self.model_done = False
+        self.done = False
+    def __str__(self):
+        return self.answer + ' conflicts %d decisions %d propagations %d' % \
+               (self.conflicts, self.decisions, self.propagations)
+    def is_answered(self):
+        return self.answer != UNKNOWN
+    # Parse a line of the log given as bytes:
+    def feed(self, line : bytes):
+        if self.done:
+            return
+        if line[:2] == b'v ':
+            self.add_model_line(line)
+        elif line[:2] == b's ':
+            if line.startswith(b's SATISFIABLE'):
+                self.answer = SAT
+            elif line.startswith(b's UNSATISFIABLE'):
+                self.answer = UNSAT
+        elif line[:2] == b'c ':
+            self.parse_stat(line)
+        self.done = self.is_answered() and (self.answer != SAT or self.model_done) and \
+                    all([getattr(self, name) >= 0 for name in self.stat_keys.values()])
+    def parse_stat(self, line : bytes):
+        words = line.split()[1:]
+        if len(words) < 2:
+            return
+        name = self.stat_keys.get(words[0])
+        if name is None:
+            return
+        # 'conflicts: 12' or 'Conflicts : 12':
+        value = words[1] if words[1] != b':' else (words[2] if len(words) > 2 else b'')
+        if value.isdigit():
+            setattr(self, name, int(value))
+    def add_model_line(self, line : bytes):
+        if self.model_name != '':
+            if self.model_file is None:
+                self.model_file = open(self.model_name, 'wb')
+                self.model_file.write(b's SATISFIABLE\n')
+            self.model_file.write(line)
+        if line.split()[-1:] == [b'0']:
+            self.model_done = True
+    # Close the model file, a log without a model has no file:
+    def close(self):
+        if self.model_file is not None:
+            self.model_file.close()
+            self.model_file = None
+    # Parse a whole log given as str:
+    def parse(self, log : str):
+        for line in log.encode().splitlines(keepends=True):
+            self.feed(line)
+        self.close()
+        return self
+
+# kissat and CaDiCaL, parameters are given before the CNF:
+class KissatAdapter:
+    stat_keys = {b'conflicts:' : 'conflicts', b'decisions:' : 'decisions', \
+                 b'propagations:' : 'propagations'}
+    needs_file = False
+    limits_itself = False
+    reports_conflicts = True
+    def __init__(self, solver : str):
+        self.solver = solver
+    def params(self):
+        return ''
+    # Command line, cnf_name is '' if the CNF is given via stdin:
+    def command(self, cnf_name='', params='', time_limit=0):
+        s = self.solver
+        for p in [self.params(), params, cnf_name]:
+            if p != '':
+                s += ' ' + p
+        return s
+    # Parameters which limit a run by conflicts or seconds, 0 - no limit:
+    def conflict_limit(self, conflicts : int):
+        return '--conflicts=' + str(conflicts) if conflicts > 0 else ''
+    def time_limit(self, seconds : int):
+        return '--time=' + str(seconds) if seconds > 0 else ''
+    def solver_log(self, model_name=''):
+        return SolverLog(self.stat_keys, model_name)
+
+class CadicalAdapter(KissatAdapter):
+    def conflict_limit(self, conflicts : int):
+        return '-c ' + str(conflicts) if conflicts > 0 else ''
+    def time_limit(self, seconds : int):
+        return '-t ' + str(seconds) if seconds > 0 else ''
+
+# clasp's configuration and enumeration mode are given in its name, e.g.
+# clasp-trendy-record or /opt/bin/clasp-trendy-record:
+class ClaspAdapter(KissatAdapter):
+    stat_keys = {b'Conflicts' : 'conflicts', b'Choices' : 'decisions'}
+    def __init__(self, solver : str):
+        dir_name, base = os.path.split(solver)
+        words = base.split('-')
+        self.solver = os.path.join(dir_name, words[0])
+        self.config = words[1] if len(words) > 1 else 'auto'
+        self.enum = words[2] if len(words) > 2 else 'auto'
+    def params(self):
+        return '--configuration=' + self.config + ' --enum-mode=' + self.enum + ' --models=0 --stats'
+    def conflict_limit(self, conflicts : int):
+        return '--solve-limit=' + str(conflicts) if conflicts > 0 else ''
+    def time_limit(self, seconds : int):
+        return '--time-limit=' + str(seconds) if seconds > 0 else ''
+
+# A script is called as 'script CNF time-limit':
+class ScriptAdapter(KissatAdapter):
+    needs_file = True
+    limits_itself = True
+    reports_conflicts = False
+    def command(self, cnf_name='', params='', time_limit=0):
+        assert(cnf_name != '')
+        return self.solver + ' ' + cnf_name + ' ' + str(time_limit)
+    def conflict_limit(self, conflicts : int):
+        return ''
+    def time_limit(self, seconds : int):
+        return ''
+    def solver_log(self, model_name=''):
+        # Statistics are optional, parsing is stopped at the answer:
+        return SolverLog(dict(), model_name)
+
+# Adapter of a solver by its name:
+def get_adapter(solver : str):
+    base = os.path.basename(solver)
+    if '.sh' in base:
+        return ScriptAdapter(solver)
+    if 'clasp' in base:
+        return ClaspAdapter(solver)
+    if 'cadical' in base:
+        return CadicalAdapter(solver)
+    return KissatAdapter(solver)
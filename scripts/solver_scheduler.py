@@ -0,0 +1,439 @@
+# Created on: 17 Oct 2026
+# Author: Oleg Zaikin
+# E-mail: zaikin.icc@gmail.com
+#
+# asyncio-based scheduler of solvers' runs. At most cpu_num runs are executed
+# at once. Once a run is finished, its slot is freed immediately and its
+# callback is called, so no polling is needed.
+#
+# Each run is started in its own process group, so a single run, or all of
+# them, can be stopped without touching other users' processes. A run can be
+# limited in CPU time by RLIMIT_CPU and in wall time by a timer. A stopped run
+# gets SIGTERM, and SIGKILL after KILL_GRACE seconds if it is still alive.
+# A scheduler can also have a memory budget, then a run is admitted only if
+# the memory predicted for it fits the budget together with running ones.
+# Runs are reaped by wait4(), so their CPU time and peak memory are known.
+# A run's output can be given line by line to a parser (see solver_adapters.py)
+# instead of being kept in memory.
+# The peak memory of a process forked from Python includes the memory of the
+# Python process, so a measured run is started by a small trampoline process
+# which waits for the command and reports the command's resource usage.
+#
+# Example:
+#   sched = solver_scheduler.Scheduler(12)
+#   await sched.submit(solver_scheduler.run_cmd('kissat a.cnf'), print)
+#   await sched.join()
+#==============================================================================
+
+import asyncio
+import logging
+import os
+import signal
+import resource
+import subprocess
+import threading
+import time
+import sys
+
+version = '0.0.9'
+
+# Seconds between SIGTERM and SIGKILL when a run is stopped:
+KILL_GRACE = 1
+# Maximal length of a line given to a parser, longer lines are split:
+LINE_LIMIT = 1 << 24
+# Size of blocks in which output not needed by a parser is skipped:
+SKIP_BLOCK_SIZE = 1 << 16
+
+# Send a signal to all processes of a run's process group:
+def signal_group(proc, sig):
+    try:
+        os.killpg(proc.pid, sig)
+    except ProcessLookupError:
+        pass
+
+# Kill all processes of a run's process group:
+def kill_group(proc):
+    signal_group(proc, signal.SIGKILL)
+
+# Function which limits CPU time of a child process before exec:
+def cpu_limiter(cpu_limit : int):
+    if cpu_limit <= 0:
+        return None
+    def limit():
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + KILL_GRACE))
+    return limit
+
+# Resources used by a finished run. Times are in seconds, max_rss is in KB.
+# They are taken from wait4(), so they include the run's waited children:
+class RunStat:
+    def __init__(self):
+        self.out = ''
+        self.returncode = None
+        self.wall_time = 0.0
+        self.user_time = 0.0
+        self.sys_time = 0.0
+        self.max_rss = 0
+    def __str__(self):
+        return 'wall : %.2f, user : %.2f, sys : %.2f, max rss : %d KB' % \
+            (self.wall_time, self.user_time, self.sys_time, self.max_rss)
+    def cpu_time(self):
+        return self.user_time + self.sys_time
+    def set_rusage(self, status, ru):
+        self.returncode = os.waitstatus_to_exitcode(status)
+        self.user_time = ru.ru_utime
+        self.sys_time = ru.ru_stime
+        self.max_rss = ru.ru_maxrss
+    # Take resource usage reported by the trampoline if any:
+    def set_reported(self, data : bytes):
+        words = data.split()
+        if len(words) == 3:
+            self.user_time = float(words[0])
+            self.sys_time = float(words[1])
+            self.max_rss = int(words[2])
+
+# Trampoline: run a shell command (argv[2]) in a child process, wait for it
+# and for all its descendants, and write their total user time, system time,
+# and max RSS to fd argv[1]. The trampoline is a child subreaper, so
+# descendants orphaned by a killed shell are reaped and accounted too.
+# SIGTERM is sent to the whole group, so the trampoline ignores it.
+TRAMPOLINE = \
+"""import os, sys, signal, resource
+try:
+    import ctypes
+    ctypes.CDLL(None).prctl(36, 1) # PR_SET_CHILD_SUBREAPER
+except (ImportError, OSError, AttributeError):
+    pass
+fd = int(sys.argv[1])
+signal.signal(signal.SIGTERM, signal.SIG_IGN)
+pid = os.fork()
+if pid == 0:
+    os.close(fd)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    os.execv('/bin/sh', ['sh', '-c', sys.argv[2]])
+_, status = os.waitpid(pid, 0)
+while True:
+    try:
+        os.wait()
+    except ChildProcessError:
+        break
+ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+try:
+    os.write(fd, b'%f %f %d' % (ru.ru_utime, ru.ru_stime, ru.ru_maxrss))
+except BrokenPipeError: # the run is cancelled, nobody reads the report
+    pass
+code = os.waitstatus_to_exitcode(status)
+sys.exit(code if code >= 0 else 128 - code)
+"""
+
+# Wait until a process is finished and reap it by wait4(). The exit is
+# noticed via a pidfd, or, if pidfds are not supported (Linux < 5.3), in a
+# thread of its own. The default executor is not used, since it has a few
+# threads, and other calls of asyncio.to_thread() would wait for runs:
+async def wait4(proc):
+    try:
+        fd = os.pidfd_open(proc.pid)
+    except (AttributeError, OSError):
+        fd = -1
+    if fd >= 0:
+        loop = asyncio.get_running_loop()
+        exited = loop.create_future()
+        loop.add_reader(fd, lambda: exited.done() or exited.set_result(None))
+        try:
+            await exited
+        finally:
+            loop.remove_reader(fd)
+            os.close(fd)
+        _, status, ru = os.wait4(proc.pid, 0)
+    else:
+        loop = asyncio.get_running_loop()
+        exited = loop.create_future()
+        def wait():
+            res = os.wait4(proc.pid, 0)
+            try:
+                loop.call_soon_threadsafe(lambda: exited.done() or exited.set_result(res))
+            except RuntimeError: # the loop is closed
+                pass
+        threading.Thread(target=wait, daemon=True).start()
+        _, status, ru = await exited
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return status, ru
+
+# Stop a run: SIGTERM, then SIGKILL if the run is not finished in time.
+# waiter is the run's wait4() task:
+async def stop_group(proc, waiter):
+    signal_group(proc, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(asyncio.shield(waiter), KILL_GRACE)
+    except asyncio.TimeoutError:
+        kill_group(proc)
+        await waiter
+
+# Write chunks of bytes to a process' stdin, it is called in a thread:
+def write_stdin(stdin, chunks):
+    try:
+        for chunk in chunks:
+            stdin.write(chunk)
+    except (BrokenPipeError, ConnectionResetError): # process is finished
+        pass
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+# Start a shell command in a new process group. If report_fd is given, the
+# command is started by the trampoline which reports to this fd:
+def popen(cmd : str, stdin, cpu_limit : int, report_fd=-1):
+    if report_fd < 0:
+        return subprocess.Popen(cmd, shell=True, bufsize=0, stdin=stdin, \
+            stdout=subprocess.PIPE, start_new_session=True, \
+            preexec_fn=cpu_limiter(cpu_limit))
+    return subprocess.Popen([sys.executable, '-S', '-c', TRAMPOLINE, str(report_fd), cmd], \
+        bufsize=0, stdin=stdin, stdout=subprocess.PIPE, start_new_session=True, \
+        pass_fds=(report_fd,), preexec_fn=cpu_limiter(cpu_limit))
+
+# Pipe for the trampoline's report, or (-1, -1) if it is not needed:
+def report_pipe(measure : bool):
+    return os.pipe() if measure else (-1, -1)
+
+# Read the trampoline's report and close the pipe:
+def read_report(stat : RunStat, report_r : int):
+    if report_r >= 0:
+        stat.set_reported(os.read(report_r, 256))
+        os.close(report_r)
+
+# Give lines of a stream to a parser until parser.done, then skip the rest.
+# The parser has methods feed(line : bytes) and close():
+async def parse_stream(reader, parser):
+    while not parser.done:
+        try:
+            line = await reader.readline()
+        except ValueError: # a too long line
+            line = await reader.read(LINE_LIMIT)
+        if not line:
+            return b''
+        parser.feed(line)
+    while len(await reader.read(SKIP_BLOCK_SIZE)) > 0:
+        pass
+    return b''
+
+# Run a shell command in a new process group and return its RunStat.
+# If chunks are given, they are written to the command's stdin.
+# If a parser is given, the output is given to it, and stat.out is empty.
+# If cpu_limit or wall_limit (in seconds) is positive, the run is limited
+# accordingly, then the output produced before the limit is kept.
+# If measure is False, the trampoline is not used, so max RSS is not exact.
+# If the run is cancelled, the whole process group is stopped.
+async def run_cmd_stat(cmd : str, chunks=None, cpu_limit=0, wall_limit=0, measure=True, parser=None):
+    loop = asyncio.get_running_loop()
+    stat = RunStat()
+    start_time = time.time()
+    report_r, report_w = report_pipe(measure)
+    try:
+        proc = popen(cmd, subprocess.PIPE if chunks is not None else subprocess.DEVNULL, \
+                     cpu_limit, report_w)
+    finally:
+        if report_w >= 0:
+            os.close(report_w)
+    reader = asyncio.StreamReader(limit=LINE_LIMIT)
+    transport, _ = await loop.connect_read_pipe( \
+        lambda: asyncio.StreamReaderProtocol(reader), proc.stdout)
+    if parser is None:
+        out = asyncio.ensure_future(reader.read())
+    else:
+        out = asyncio.ensure_future(parse_stream(reader, parser))
+    waiter = asyncio.ensure_future(wait4(proc))
+    writer = None
+    if chunks is not None:
+        writer = asyncio.ensure_future(asyncio.to_thread(write_stdin, proc.stdin, chunks))
+    try:
+        done, _ = await asyncio.wait([waiter], timeout=wall_limit if wall_limit > 0 else None)
+        if len(done) == 0:
+            await stop_group(proc, waiter)
+        stat.set_rusage(*(await waiter))
+        stat.wall_time = time.time() - start_time
+        stat.out = (await out).decode(errors='replace')
+        if writer is not None:
+            await writer
+    except asyncio.CancelledError:
+        out.cancel()
+        await stop_group(proc, waiter)
+        raise
+    finally:
+        # The writer is finished once the process group is stopped, then its
+        # writes fail on a closed pipe:
+        if writer is not None and not writer.done() and waiter.done():
+            await asyncio.gather(writer, return_exceptions=True)
+        transport.close()
+        read_report(stat, report_r)
+        if parser is not None:
+            parser.close()
+    return stat
+
+# Run a shell command and return its stdout, see run_cmd_stat():
+async def run_cmd(cmd : str, chunks=None, cpu_limit=0, wall_limit=0):
+    return (await run_cmd_stat(cmd, chunks, cpu_limit, wall_limit, False)).out
+
+# Blocking version of run_cmd_stat() for scripts without an event loop:
+def run_cmd_sync_stat(cmd : str, cpu_limit=0, wall_limit=0, measure=True, parser=None):
+    stat = RunStat()
+    start_time = time.time()
+    report_r, report_w = report_pipe(measure)
+    try:
+        proc = popen(cmd, subprocess.DEVNULL, cpu_limit, report_w)
+    finally:
+        if report_w >= 0:
+            os.close(report_w)
+    finished = threading.Event()
+    def stop():
+        signal_group(proc, signal.SIGTERM)
+        if not finished.wait(KILL_GRACE):
+            kill_group(proc)
+    timer = threading.Timer(wall_limit, stop) if wall_limit > 0 else None
+    if timer is not None:
+        timer.start()
+    try:
+        if parser is None:
+            out = proc.stdout.read()
+        else:
+            out = b''
+            for line in proc.stdout:
+                if not parser.done:
+                    parser.feed(line)
+        _, status, ru = os.wait4(proc.pid, 0)
+    except BaseException: # e.g. KeyboardInterrupt
+        kill_group(proc)
+        proc.wait()
+        if report_r >= 0:
+            os.close(report_r)
+        raise
+    finally:
+        finished.set()
+        if timer is not None:
+            timer.cancel()
+        proc.stdout.close()
+        if parser is not None:
+            parser.close()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    stat.set_rusage(status, ru)
+    read_report(stat, report_r)
+    stat.wall_time = time.time() - start_time
+    stat.out = out.decode(errors='replace')
+    return stat
+
+# Blocking version of run_cmd():
+def run_cmd_sync(cmd : str, cpu_limit=0, wall_limit=0):
+    return run_cmd_sync_stat(cmd, cpu_limit, wall_limit, False).out
+
+# Available memory in KB:
+def available_memory():
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 1024
+
+# Runs coroutines in at most cpu_num slots. If mem_budget (in KB) is
+# positive, the memory reserved by running coroutines is at most mem_budget,
+# except a single coroutine which needs more than the whole budget:
+class Scheduler:
+    def __init__(self, cpu_num : int, mem_budget=0):
+        assert(cpu_num > 0)
+        self.cpu_num = cpu_num
+        self.free_slots = cpu_num
+        self.mem_budget = mem_budget
+        self.used_mem = 0
+        self.changed = asyncio.Event()
+        self.tasks = set()
+        self.tags = dict() # task -> tag given in start()
+        self.mems = dict() # task -> memory given in start()
+        # The first exception of a failed task or callback:
+        self.error = None
+    # Number of started and not finished tasks:
+    def running(self):
+        return len(self.tasks)
+    def _fits(self, mem : int):
+        if self.free_slots <= 0:
+            return False
+        return self.mem_budget <= 0 or self.used_mem == 0 or \
+               self.used_mem + mem <= self.mem_budget
+    # Raise the first exception of a failed task or callback, so a phase
+    # fails instead of losing the task's result:
+    def check(self):
+        if self.error is not None:
+            raise self.error
+    # Wait for a free slot and mem KB of memory, and take them:
+    async def acquire(self, mem=0):
+        self.check()
+        while not self._fits(mem):
+            self.changed.clear()
+            await self.changed.wait()
+            self.check()
+        self.free_slots -= 1
+        self.used_mem += mem
+    # Give back a slot and memory taken by acquire() but not used:
+    def release(self, mem=0):
+        self.free_slots += 1
+        self.used_mem -= mem
+        self.changed.set()
+    # Add slots, e.g. cores of a connected remote worker:
+    def add_slots(self, num : int):
+        self.cpu_num += num
+        self.free_slots += num
+        self.changed.set()
+    # Remove slots, while busy ones are removed, free_slots is negative:
+    def remove_slots(self, num : int):
+        self.cpu_num -= num
+        self.free_slots -= num
+    # Start a coroutine in an already taken slot. When the coroutine is
+    # finished, the slot and mem are freed and callback is called on its
+    # result. A tag allows cancelling a group of tasks, see tagged():
+    def start(self, coro, callback=None, tag=None, mem=0):
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        if tag is not None:
+            self.tags[task] = tag
+        self.mems[task] = mem
+        task.add_done_callback(lambda t: self._done(t, callback))
+        return task
+    # Wait for a free slot and memory and start a coroutine in it:
+    async def submit(self, coro, callback=None, tag=None, mem=0):
+        await self.acquire(mem)
+        return self.start(coro, callback, tag, mem)
+    # Started and not finished tasks whose tags satisfy a predicate:
+    def tagged(self, pred):
+        return [task for task, tag in self.tags.items() if pred(tag)]
+    def _done(self, task, callback):
+        self.tasks.discard(task)
+        self.tags.pop(task, None)
+        self.release(self.mems.pop(task))
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logging.error('task failed : ' + repr(task.exception()))
+            if self.error is None:
+                self.error = task.exception()
+            return
+        if callback is not None:
+            try:
+                callback(task.result())
+            except Exception as e:
+                logging.error('task callback failed : ' + repr(e))
+                if self.error is None:
+                    self.error = e
+    # Wait until all started tasks are finished, then raise the first
+    # exception of a failed task if any:
+    async def join(self):
+        while len(self.tasks) > 0:
+            await asyncio.wait(set(self.tasks))
+        self.check()
+    # Cancel given (by default, all) started tasks and wait for them:
+    async def cancel(self, tasks=None):
+        tasks = set(self.tasks) if tasks is None else set(tasks)
+        for task in tasks:
+            task.cancel()
+        if len(tasks) > 0:
+            await asyncio.wait(tasks)
@@ -18,9 +18,10 @@
 
 import sys
 import binascii
+import dimacs
 
 script_name = 'sort_solution.py'
-version = '0.0.5'
+version = '0.0.6'
 
 KNOWN_VARS_NUM = 512 
 
@@ -47,19 +48,7 @@ else:
 print('input_vars :')
 print(input_vars)
 
-literals = []
-with open(solname, 'r') as f:
-	lines = f.read().splitlines()
-	for line in lines:
-		if line == '' or line[0] == 's':
-			continue
-		if line[:2] == 'v ':
-			s = line[2:]
-			assert(len(s) > 0)
-			lst = s.split(' ')
-			for x in lst:
-				if x != '0':
-					literals.append(int(x))
+literals = dimacs.read_model(solname)
 
 literals = sorted(literals, key=abs)
 print('literals :')
@@ -107,19 +96,8 @@ print('\n' + latex_hex_str)
 if cnfname == '':
 		exit(1)
 
-vars_num = 0
-clauses_num = 0
-clauses = []
-with open(cnfname, 'r') as f:
-	lines = f.read().splitlines()
-	for line in lines:
-		if line == '' or line[0] == 'c':
-			continue
-		if line[0] == 'p':
-			vars_num = int(line.split(' ')[2])
-			clauses_num = int(line.split(' ')[3])
-		else:
-			clauses.append(line)
+cnf = dimacs.read_cnf(cnfname)
+vars_num = cnf.vars_num
 
 vars_set = set()
 for i in range(vars_num):
@@ -131,9 +109,6 @@ for lit in literals:
 
 assert(vars_set == vars_set_from_literals)
 
-with open(cnfname.split('.cnf')[0] + '_known' + str(KNOWN_VARS_NUM) + '.cnf', 'w') as f:
-	f.write('p cnf %d %d\n' % (vars_num, clauses_num + KNOWN_VARS_NUM))
-	for var in input_vars:
-		f.write(str(literals[var-1]) + ' 0\n')
-	for c in clauses:
-		f.write(c + '\n')
+# Known variables are added to the end of the CNF:
+with open(cnfname.split('.cnf')[0] + '_known' + str(KNOWN_VARS_NUM) + '.cnf', 'wb') as f:
+	dimacs.write_cnf(f, cnf, [[literals[var-1]] for var in input_vars])
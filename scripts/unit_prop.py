@@ -0,0 +1,187 @@
+# Created on: 17 Oct 2026
+# Author: Oleg Zaikin
+# E-mail: zaikin.icc@gmail.com
+#
+# Unit propagation with two watched literals. Literals of all clauses are
+# kept one after another in a flat int array, clause i is
+# lits[starts[i]:starts[i+1]], and its watched literals are the first two
+# ones. Unit clauses are propagated once on the root level, then cubes are
+# propagated on top of it and undone by backtracking, so many cubes are
+# checked against one CNF without copying it.
+#
+# It is used instead of runs of a lookahead solver with '-d 1' to count free
+# variables, to find cubes which are refuted by unit propagation before a
+# CDCL solver is run, and to drop literals of a cube which are implied by
+# its other literals.
+#
+# Example:
+#   prop = unit_prop.Propagator.read('problem.cnf')
+#   print(prop.free_vars_num())
+#   if not prop.refutes(['-12', '345']):
+#       cube = prop.reduce_cube(['-12', '345'])
+#==============================================================================
+
+from array import array
+import dimacs
+
+version = '0.0.1'
+
+# Index of a literal in watch lists:
+def lit_index(lit : int):
+    return 2*lit if lit > 0 else 1 - 2*lit
+
+class Propagator:
+    # clauses - lists of int literals:
+    def __init__(self, clauses, vars_num=0):
+        self.lits = array('i')
+        self.starts = array('q', [0])
+        self.conflict = False
+        units = []
+        for clause in clauses:
+            if len(clause) == 0:
+                self.conflict = True
+            elif len(clause) == 1:
+                units.append(clause[0])
+            else:
+                self.lits.extend(clause)
+                self.starts.append(len(self.lits))
+        for lit in self.lits:
+            vars_num = vars_num if vars_num >= abs(lit) else abs(lit)
+        for lit in units:
+            vars_num = vars_num if vars_num >= abs(lit) else abs(lit)
+        self.vars_num = vars_num
+        # Value of a variable: 1 - true, -1 - false, 0 - unassigned:
+        self.values = array('b', bytes(vars_num + 1))
+        self.trail = []
+        self.watches = [[] for _ in range(2*vars_num + 2)]
+        for i in range(len(self.starts) - 1):
+            s = self.starts[i]
+            self.watches[lit_index(self.lits[s])].append(i)
+            self.watches[lit_index(self.lits[s+1])].append(i)
+        # Root level:
+        if not self.conflict:
+            self.conflict = not self.propagate(units)
+    @staticmethod
+    def read(cnf_name : str):
+        cnf = dimacs.read_cnf(cnf_name)
+        prop = Propagator(dimacs.iter_clauses(cnf), cnf.vars_num)
+        cnf.close()
+        return prop
+    def __str__(self):
+        return 'vars : ' + str(self.vars_num) + ', clauses : ' + str(len(self.starts) - 1) + \
+               ', fixed : ' + str(len(self.trail)) + (', conflict' if self.conflict else '')
+    # 1 if a literal is true, -1 if false, 0 if unassigned:
+    def value(self, lit : int):
+        if abs(lit) > self.vars_num:
+            return 0
+        v = self.values[abs(lit)]
+        return v if lit > 0 else -v
+    # Propagate literals (int or str), False is returned on a conflict.
+    # Assignments are kept until backtrack():
+    def propagate(self, lits):
+        values = self.values
+        trail = self.trail
+        head = len(trail)
+        for lit in lits:
+            lit = int(lit)
+            # Variables which are not in clauses can not cause a conflict:
+            if abs(lit) > self.vars_num:
+                continue
+            val = self.value(lit)
+            if val < 0:
+                return False
+            if val == 0:
+                values[abs(lit)] = 1 if lit > 0 else -1
+                trail.append(lit)
+        clause_lits = self.lits
+        starts = self.starts
+        watches = self.watches
+        while head < len(trail):
+            false_lit = -trail[head]
+            head += 1
+            ws = watches[lit_index(false_lit)]
+            i = 0
+            j = 0
+            while i < len(ws):
+                c = ws[i]
+                i += 1
+                s = starts[c]
+                # The falsified watched literal is moved to the second place:
+                if clause_lits[s] == false_lit:
+                    clause_lits[s] = clause_lits[s+1]
+                    clause_lits[s+1] = false_lit
+                first = clause_lits[s]
+                v = values[abs(first)]
+                first_val = v if first > 0 else -v
+                if first_val > 0:
+                    ws[j] = c
+                    j += 1
+                    continue
+                # Find a new literal to watch:
+                for k in range(s + 2, starts[c+1]):
+                    lit = clause_lits[k]
+                    v = values[abs(lit)]
+                    if (v if lit > 0 else -v) >= 0:
+                        clause_lits[s+1] = lit
+                        clause_lits[k] = false_lit
+                        watches[lit_index(lit)].append(c)
+                        break
+                else:
+                    ws[j] = c
+                    j += 1
+                    if first_val < 0:
+                        # Keep the rest of watches:
+                        while i < len(ws):
+                            ws[j] = ws[i]
+                            j += 1
+                            i += 1
+                        del ws[j:]
+                        return False
+                    values[abs(first)] = 1 if first > 0 else -1
+                    trail.append(first)
+            del ws[j:]
+        return True
+    # Undo assignments made after the trail had a given size:
+    def backtrack(self, size : int):
+        for lit in self.trail[size:]:
+            self.values[abs(lit)] = 0
+        del self.trail[size:]
+    # Whether unit propagation of a cube leads to a conflict:
+    def refutes(self, cube : list):
+        if self.conflict:
+            return True
+        size = len(self.trail)
+        res = not self.propagate(cube)
+        self.backtrack(size)
+        return res
+    # Drop literals which are implied by the other literals of a cube (or
+    # fixed on the root level). The cube must not be refuted:
+    def reduce_cube(self, cube : list):
+        kept = list(cube)
+        i = 0
+        while i < len(kept):
+            size = len(self.trail)
+            is_implied = self.propagate(kept[:i] + kept[i+1:]) and self.value(int(kept[i])) > 0
+            self.backtrack(size)
+            if is_implied:
+                del kept[i]
+            else:
+                i += 1
+        return kept
+    # Number of unassigned variables of clauses which are not satisfied on
+    # the root level:
+    def free_vars_num(self):
+        if self.conflict:
+            return 0
+        values = self.values
+        clause_lits = self.lits
+        starts = self.starts
+        is_free = array('b', bytes(self.vars_num + 1))
+        for c in range(len(starts) - 1):
+            clause = clause_lits[starts[c]:starts[c+1]]
+            if any([(values[abs(lit)] if lit > 0 else -values[abs(lit)]) > 0 for lit in clause]):
+                continue
+            for lit in clause:
+                if values[abs(lit)] == 0:
+                    is_free[abs(lit)] = 1
+        return sum(is_free)